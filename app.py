@@ -5,44 +5,450 @@ import numpy as np
 from PIL import Image
 import io
 import base64
+import atexit
+import hashlib
+import hmac
 import os
+import threading
+import time
+
+from decoders import accepted_formats, available_decoders, select_decoders, sniff_format
+from embedding_index import EmbeddingIndex
+from heatmap import class_activation_map, encode_overlay, load_head
+from inference_pool import InferencePool
+from memory import WorkerMemory
+from persistence import PersistenceQueue, store_from_config
+from profiler import SamplingProfiler, SlowRequestLog
+from quality import QualityStats, check_image, load_thresholds
+from scheduler import PriorityScheduler, QueueFull
+from shadow import ShadowEvaluator
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-MODEL_PATH = 'oral_cancer_model.tflite'
+MODEL_PATH = os.environ.get('MODEL_PATH', 'oral_cancer_model.tflite')
 IMG_SIZE = 224
+# JPEG/PNG selalu; WebP/AVIF jika build Pillow di host ini mendukungnya
+# (header selalu dibaca Pillow, backend lain hanya mempercepat decode)
+DECODER_BACKENDS = available_decoders()
+ACCEPTED_FORMATS = accepted_formats(DECODER_BACKENDS)
+# Pilih decoder tercepat per format dengan micro-benchmark saat startup
+DECODER_BENCHMARK = os.environ.get('DECODER_BENCHMARK', '1') == '1'
+
+# Batas ukuran: payload dicek dari Content-Length, dimensi gambar dari header
+# file (Image.open belum decode piksel), sebelum decode penuh
+MAX_UPLOAD_MB = float(os.environ.get('MAX_UPLOAD_MB', 16))
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 25_000_000))
+# Recycle worker gunicorn jika RSS melewati budget (tidak aktif jika kosong)
+WORKER_MEMORY_BUDGET_MB = float(os.environ.get('WORKER_MEMORY_BUDGET_MB', 0)) or None
+
+# Threshold konservatif (dalam prob kanker), lihat predict()
+CANCER_THRESHOLD = 0.8
+NORMAL_THRESHOLD = 0.4
+
+# Endpoint /admin/* hanya aktif jika ADMIN_TOKEN di-set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+# Samakan dengan gunicorn --timeout (default 30 s); worker sync yang diam
+# lebih lama dari ini di-kill master, jadi profil dibatasi di bawahnya
+WORKER_TIMEOUT = float(os.environ.get('WORKER_TIMEOUT', 30))
+PROFILE_MAX_SECONDS = max(1.0, WORKER_TIMEOUT - 5)
+# Log request lambat hanya aktif jika SLOW_REQUEST_MS di-set
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 0))
+
+# Test-time augmentation (opt-in per request dengan "tta": true)
+TTA_ENABLED = os.environ.get('TTA_ENABLED', '0') == '1'
+TTA_AGGREGATE = os.environ.get('TTA_AGGREGATE', 'mean')  # mean | min
+TTA_CROP_SIZE = int(IMG_SIZE * 1.15)
+TTA_VIEWS = 4  # full, center crop, dan flip horizontal keduanya
+
+# Cascade: model kecil menjawab kasus yang jelas, sisanya ke model penuh.
+# Batas dalam prob kanker; di antara keduanya dianggap belum yakin.
+CASCADE_ENABLED = os.environ.get('CASCADE_ENABLED', '0') == '1'
+FAST_MODEL_PATH = os.environ.get('FAST_MODEL_PATH', 'oral_cancer_model_fast.tflite')
+CASCADE_LOW = float(os.environ.get('CASCADE_LOW', 0.1))
+CASCADE_HIGH = float(os.environ.get('CASCADE_HIGH', 0.95))
+
+# Index near-duplicate (butuh model yang diekspor dengan embedding_output=True).
+# Upload yang hampir identik dengan gambar sebelumnya ditandai di respons
+# (hanya informasi; prediksi selalu dari gambar ini sendiri).
+EMBEDDING_INDEX_PATH = os.environ.get('EMBEDDING_INDEX_PATH')
+EMBEDDING_INDEX_CAPACITY = int(os.environ.get('EMBEDDING_INDEX_CAPACITY', 5000))
+EMBEDDING_INDEX_SAVE_SECONDS = 60
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', 0.98))
+
+# Pre-screen kualitas gambar (blur, eksposur, warna) sebelum inferensi:
+# off | flag (hasil tetap dikirim, ditambah blok 'quality') | reject (422)
+QUALITY_MODE = os.environ.get('QUALITY_MODE', 'flag')
+QUALITY_THRESHOLDS = load_thresholds(os.environ.get('QUALITY_THRESHOLDS'))
 
+# Heatmap lesi (opt-in per request dengan "heatmap": true), butuh model yang
+# diekspor dengan heatmap_output=True beserta file bobot head-nya
+HEATMAP_HEAD_PATH = os.environ.get('HEATMAP_HEAD_PATH', os.path.splitext(MODEL_PATH)[0] + '_head.npz')
+
+# Simpan gambar + prediksi untuk re-training lewat antrian background
+# (contoh: PERSIST_STORE=dir:/data/uploads). Tidak aktif jika kosong.
+PERSIST_STORE = os.environ.get('PERSIST_STORE')
+PERSIST_QUEUE_SIZE = int(os.environ.get('PERSIST_QUEUE_SIZE', 256))
+
+# Jalur prioritas di depan interpreter: request bulk (header X-Priority: bulk
+# atau /predict/bulk) tidak bisa menahan request interaktif dari web UI.
+# Hanya berpengaruh jika worker menerima beberapa request sekaligus:
+# jalankan gunicorn dengan --threads > 1 (lihat Procfile). Dengan satu
+# worker sync, request bulk menahan request lain di backlog accept gunicorn.
+INTERACTIVE_SHARE = float(os.environ.get('INTERACTIVE_SHARE', 0.8))
+if not 0 < INTERACTIVE_SHARE <= 1:
+    raise SystemExit(f"INTERACTIVE_SHARE must be in (0, 1], got {INTERACTIVE_SHARE}")
+# INTERACTIVE_SHARE=1.0: bulk tetap mendapat porsi minimum supaya tidak kelaparan
+MIN_BULK_SHARE = 0.01
+INTERACTIVE_MAX_QUEUE = int(os.environ.get('INTERACTIVE_MAX_QUEUE', 32))
+BULK_MAX_QUEUE = int(os.environ.get('BULK_MAX_QUEUE', 128))
+
+# Shadow evaluation model kandidat pada sampel trafik (tidak aktif jika kosong)
+SHADOW_MODEL_PATH = os.environ.get('SHADOW_MODEL_PATH')
+SHADOW_SAMPLE_RATE = float(os.environ.get('SHADOW_SAMPLE_RATE', 0.1))
+
+# Proses inference terpisah lewat shared memory (lihat inference_pool.py).
+# Jalankan gunicorn dengan --preload supaya semua worker memakai pool yang
+# sama. TTA, cascade dan embedding index hanya tersedia tanpa pool.
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))
+INFERENCE_SLOTS = int(os.environ.get('INFERENCE_SLOTS', 0)) or None
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 30))
+
+decoders = {}
+decoder_report = {}
 interpreter = None
 input_details = None
 output_details = None
+prob_output = None
+embedding_output = None
+feature_map_output = None
+heatmap_head = None
+input_dtype = np.float32
+embedding_index = None
+shadow = None
+tta_interpreter = None
+fast_interpreter = None
+fast_input_details = None
+fast_output_details = None
+inference_pool = None
+slow_log = SlowRequestLog(SLOW_REQUEST_MS) if SLOW_REQUEST_MS > 0 else None
+profile_lock = threading.Lock()
+worker_memory = WorkerMemory(WORKER_MEMORY_BUDGET_MB)
+quality_stats = QualityStats()
+LANE_SHARES = {'interactive': INTERACTIVE_SHARE, 'bulk': max(1 - INTERACTIVE_SHARE, MIN_BULK_SHARE)}
+# Capacity 1: satu interpreter per worker, dan interpreter tidak thread-safe.
+# Dengan inference pool, prioritas antar lane diatur pool secara global untuk
+# semua worker gunicorn; scheduler lokal hanya membatasi antrian per lane.
+scheduler = PriorityScheduler({
+    'interactive': (LANE_SHARES['interactive'], INTERACTIVE_MAX_QUEUE),
+    'bulk': (LANE_SHARES['bulk'], BULK_MAX_QUEUE)
+}, capacity=(INFERENCE_SLOTS or 4 * INFERENCE_WORKERS) if INFERENCE_WORKERS > 0 else 1)
+persist_queue = PersistenceQueue(store_from_config(PERSIST_STORE), PERSIST_QUEUE_SIZE) if PERSIST_STORE else None
+
+def initialize_fast_model():
+    global fast_interpreter, fast_input_details, fast_output_details
+    if not os.path.exists(FAST_MODEL_PATH):
+        print(f"Cascade disabled, fast model not found: {FAST_MODEL_PATH}")
+        return False
+    fast_interpreter = tf.lite.Interpreter(model_path=FAST_MODEL_PATH)
+    fast_interpreter.allocate_tensors()
+    fast_input_details = fast_interpreter.get_input_details()
+    fast_output_details = [find_prob_output(fast_interpreter.get_output_details())]
+    return True
+
+def find_prob_output(details):
+    # Output probabilitas berbentuk (batch, 1); output lain (embedding)
+    # punya dimensi terakhir > 1. Urutan output TFLite tidak dijamin.
+    return next(d for d in details if d['shape'][-1] == 1)
+
+def find_embedding_output(details):
+    return next((d for d in details if len(d['shape']) == 2 and d['shape'][-1] > 1), None)
+
+def find_feature_map_output(details):
+    return next((d for d in details if len(d['shape']) == 4), None)
+
+def initialize_embedding_index():
+    global embedding_index
+    dim = int(embedding_output['shape'][-1])
+    if os.path.exists(EMBEDDING_INDEX_PATH):
+        embedding_index = EmbeddingIndex.load(EMBEDDING_INDEX_PATH, EMBEDDING_INDEX_CAPACITY)
+    else:
+        embedding_index = EmbeddingIndex(dim, EMBEDDING_INDEX_CAPACITY)
+
+    # Semua worker gunicorn menyimpan ke file yang sama, jadi selalu merge
+    def save_periodically():
+        last_saved = embedding_index.version
+        while True:
+            time.sleep(EMBEDDING_INDEX_SAVE_SECONDS)
+            version = embedding_index.version
+            if version != last_saved:
+                embedding_index.save(EMBEDDING_INDEX_PATH, merge=True)
+                last_saved = version
+
+    def start_saver():
+        threading.Thread(target=save_periodically, daemon=True).start()
+
+    start_saver()
+    # Thread tidak ikut ter-fork (gunicorn --preload): mulai ulang di tiap worker
+    os.register_at_fork(after_in_child=start_saver)
+    atexit.register(lambda: embedding_index.save(EMBEDDING_INDEX_PATH, merge=True))
+    return True
+
+def decision_band(prob_cancer):
+    if prob_cancer >= CANCER_THRESHOLD:
+        return 'cancer'
+    if prob_cancer <= NORMAL_THRESHOLD:
+        return 'normal'
+    return 'borderline'
+
+def initialize_shadow():
+    global shadow
+    if not os.path.exists(SHADOW_MODEL_PATH):
+        print(f"Shadow disabled, candidate model not found: {SHADOW_MODEL_PATH}")
+        return False
+    shadow = ShadowEvaluator(SHADOW_MODEL_PATH, SHADOW_SAMPLE_RATE, classify=decision_band)
+    return True
+
+def initialize_inference_pool():
+    global inference_pool, input_dtype
+    inference_pool = InferencePool(MODEL_PATH, INFERENCE_WORKERS, INFERENCE_SLOTS,
+                                   IMG_SIZE, INFERENCE_TIMEOUT, lanes=LANE_SHARES).start()
+    input_dtype = inference_pool.input_dtype
+    shadowing = bool(SHADOW_MODEL_PATH) and initialize_shadow()
+    print(f"AI Model loaded in {INFERENCE_WORKERS} inference processes "
+          f"(input: {np.dtype(input_dtype).name}, slots: {inference_pool.slots}, "
+          f"shadow: {'on' if shadowing else 'off'})")
+    return True
+
+def model_loaded():
+    return interpreter is not None or inference_pool is not None
 
 def initialize_model():
-    global interpreter, input_details, output_details
+    global interpreter, input_details, output_details, input_dtype, tta_interpreter
+    global prob_output, embedding_output, feature_map_output, heatmap_head
     try:
         if not os.path.exists(MODEL_PATH):
             print(f"Model not found: {MODEL_PATH}")
             return False
+        if INFERENCE_WORKERS > 0:
+            return initialize_inference_pool()
         interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
         interpreter.allocate_tensors()
         input_details = interpreter.get_input_details()
         output_details = interpreter.get_output_details()
-        print("AI Model loaded successfully")
+        prob_output = find_prob_output(output_details)
+        embedding_output = find_embedding_output(output_details)
+        feature_map_output = find_feature_map_output(output_details)
+        if feature_map_output is not None and os.path.exists(HEATMAP_HEAD_PATH):
+            heatmap_head = load_head(HEATMAP_HEAD_PATH)
+        # Model yang diekspor dengan uint8_input=True sudah memuat rescale /255
+        # di dalam graph, jadi piksel dikirim apa adanya tanpa konversi float.
+        input_dtype = input_details[0]['dtype']
+        if TTA_ENABLED:
+            # Interpreter terpisah dengan batch TTA_VIEWS dialokasikan sekali,
+            # supaya interpreter utama tidak perlu di-resize bolak-balik
+            tta_interpreter = tf.lite.Interpreter(model_path=MODEL_PATH)
+            tta_interpreter.resize_tensor_input(
+                input_details[0]['index'], [TTA_VIEWS, IMG_SIZE, IMG_SIZE, 3])
+            tta_interpreter.allocate_tensors()
+        cascade = CASCADE_ENABLED and initialize_fast_model()
+        if EMBEDDING_INDEX_PATH and embedding_output is None:
+            print("Embedding index disabled, model has no embedding output")
+        index = bool(EMBEDDING_INDEX_PATH) and embedding_output is not None and initialize_embedding_index()
+        shadowing = bool(SHADOW_MODEL_PATH) and initialize_shadow()
+        print(f"AI Model loaded successfully (input: {np.dtype(input_dtype).name}, "
+              f"tta: {'on' if TTA_ENABLED else 'off'}, cascade: {'on' if cascade else 'off'}, "
+              f"embedding index: {'on' if index else 'off'}, shadow: {'on' if shadowing else 'off'}, "
+              f"heatmap: {'on' if heatmap_head is not None else 'off'})")
         return True
     except Exception as e:
         print(f"Error loading model: {e}")
         return False
 
-def predict_image(image_bytes):
+def image_to_input(img_array, dtype=None):
+    dtype = input_dtype if dtype is None else dtype
+    if dtype == np.uint8:
+        return np.asarray(img_array, dtype=np.uint8)
+    return np.asarray(img_array, dtype=np.float32) / 255.0
+
+def run_fast_model(img):
+    """Skor model cascade tahap pertama (ukuran input dibaca dari model)"""
+    _, height, width, _ = fast_input_details[0]['shape']
+    small = img.resize((int(width), int(height)))
+    batch = np.expand_dims(image_to_input(small, fast_input_details[0]['dtype']), axis=0)
+    fast_interpreter.set_tensor(fast_input_details[0]['index'], batch)
+    fast_interpreter.invoke()
+    return float(fast_interpreter.get_tensor(fast_output_details[0]['index'])[0][0])
+
+def tta_batch(img, resized=None):
+    """Bangun semua view TTA sekaligus sebagai satu batch (N, H, W, 3)"""
+    full = np.asarray(resized if resized is not None else img.resize((IMG_SIZE, IMG_SIZE)))
+    large = np.asarray(img.resize((TTA_CROP_SIZE, TTA_CROP_SIZE)))
+    offset = (TTA_CROP_SIZE - IMG_SIZE) // 2
+    views = np.stack([full, large[offset:offset + IMG_SIZE, offset:offset + IMG_SIZE]])
+    return np.concatenate([views, views[:, :, ::-1]])
+
+def run_tta(batch):
+    """batch: hasil image_to_input(tta_batch(...)), dibuat di luar supaya preprocess terukur"""
+    tta_interpreter.set_tensor(input_details[0]['index'], batch)
+    tta_interpreter.invoke()
+    scores = tta_interpreter.get_tensor(prob_output['index'])[:, 0]
+    embedding = None
+    if embedding_output is not None:
+        # View pertama = gambar utuh, sama dengan jalur tanpa TTA
+        embedding = tta_interpreter.get_tensor(embedding_output['index'])[0].copy()
+    feature_map = None
+    if heatmap_head is not None:
+        feature_map = tta_interpreter.get_tensor(feature_map_output['index'])[0].copy()
+    # Skor = probabilitas non-kanker; 'min' memilih view paling mencurigakan
+    # (sensitivitas lebih tinggi), 'mean' merata-rata semua view
+    prediction = float(scores.min() if TTA_AGGREGATE == 'min' else scores.mean())
+    return prediction, scores, embedding, feature_map
+
+class ImageTooLarge(Exception):
+    pass
+
+class UnsupportedFormat(Exception):
+    pass
+
+class LowQualityImage(Exception):
+    def __init__(self, issues, metrics):
+        super().__init__(', '.join(issues))
+        self.issues = issues
+        self.metrics = metrics
+
+def prescreen(img, info=None):
+    """Cek kualitas di luar slot scheduler; raise LowQualityImage di mode reject"""
+    t0 = time.perf_counter()
+    metrics, issues = check_image(img, QUALITY_THRESHOLDS)
+    latency_ms = (time.perf_counter() - t0) * 1000
+    rejected = QUALITY_MODE == 'reject' and bool(issues)
+    quality_stats.record(issues, latency_ms, rejected)
+    if info is not None:
+        info['quality_ms'] = latency_ms
+        info['quality'] = {'ok': not issues, 'issues': issues,
+                           'metrics': {k: round(v, 3) for k, v in metrics.items()}}
+    if rejected:
+        raise LowQualityImage(issues, metrics)
+
+def initialize_decoders():
+    global decoders, decoder_report
+    if DECODER_BENCHMARK:
+        decoders, decoder_report = select_decoders(DECODER_BACKENDS, ACCEPTED_FORMATS)
+    else:
+        decoders = {mime: next(d for d in DECODER_BACKENDS if mime in d.formats) for mime in ACCEPTED_FORMATS}
+    print("Decoders: " + ', '.join(f"{mime.split('/')[1]}={d.name}" for mime, d in decoders.items()))
+
+def decode_image(image_bytes):
+    mime = sniff_format(image_bytes)
+    if mime not in decoders:
+        raise UnsupportedFormat(mime or 'unknown')
+    # Image.open hanya membaca header, jadi ukuran dicek sebelum decode penuh
+    header = Image.open(io.BytesIO(image_bytes))
+    original_size = header.size
+    if original_size[0] * original_size[1] > MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(f"{original_size[0]}x{original_size[1]}")
+    worker_memory.record_image(original_size)
+    img = decoders[mime].decode(image_bytes, opened=header)
+    # Fast path: klien yang mengikuti /config mengirim RGB IMG_SIZE x IMG_SIZE,
+    # jadi convert dan resize (masing-masing satu salinan penuh) dilewati
+    conforming = img.mode == 'RGB' and img.size == (IMG_SIZE, IMG_SIZE)
+    if not conforming:
+        img = img.convert('RGB')
+    return img, original_size, conforming
+
+def score_image(img, conforming, info=None, tta=False, cascade=None, heatmap=False, resized=None,
+                lane='interactive'):
+    """
+    Semua pemakaian interpreter; dipanggil di dalam slot scheduler.
+    resized: img yang sudah di-resize ke IMG_SIZE (jika sudah dibuat di luar slot)
+    """
+    t1 = time.perf_counter()
+    if cascade is None:
+        cascade = fast_interpreter is not None and not tta
+    if cascade:
+        fast_prediction = run_fast_model(img)
+        t_fast = time.perf_counter()
+        if info is not None:
+            info['fast_ms'] = (t_fast - t1) * 1000
+        if not CASCADE_LOW < 1 - fast_prediction < CASCADE_HIGH:
+            if info is not None:
+                info['stage'] = 'fast'
+                # Untuk shadow: tanpa salinan/resize di sini
+                info['model_input'] = resized if resized is not None else img
+            return fast_prediction
+        if info is not None:
+            info['fast_prediction'] = fast_prediction
+        t1 = t_fast
+    if info is not None:
+        info['stage'] = 'full'
+    if tta and tta_interpreter is not None:
+        if resized is None:
+            resized = img if conforming else img.resize((IMG_SIZE, IMG_SIZE))
+        batch = image_to_input(tta_batch(img, resized))
+        t2 = time.perf_counter()
+        prediction, scores, embedding, feature_map = run_tta(batch)
+        if info is not None:
+            info['model_input'] = resized
+            info['tta_scores'] = [float(x) for x in scores]
+            info['embedding'] = embedding
+            if heatmap:
+                info['feature_map'] = feature_map
+    else:
+        if not conforming:
+            img = resized if resized is not None else img.resize((IMG_SIZE, IMG_SIZE))
+        if info is not None:
+            info['model_input'] = img
+        if inference_pool is not None:
+            # Konversi dtype terjadi di proses inference
+            t2 = time.perf_counter()
+            prediction = inference_pool.score(img, lane)
+        else:
+            img_array = np.expand_dims(image_to_input(img), axis=0)
+            t2 = time.perf_counter()
+            interpreter.set_tensor(input_details[0]['index'], img_array)
+            interpreter.invoke()
+            prediction = interpreter.get_tensor(prob_output['index'])[0][0]
+            if info is not None and embedding_output is not None:
+                info['embedding'] = interpreter.get_tensor(embedding_output['index'])[0].copy()
+            if info is not None and heatmap and heatmap_head is not None:
+                info['feature_map'] = interpreter.get_tensor(feature_map_output['index'])[0].copy()
+    if info is not None:
+        info['preprocess_ms'] = (t2 - t1) * 1000
+        info['invoke_ms'] = (time.perf_counter() - t2) * 1000
+    return float(prediction)
+
+def predict_image(image_bytes, info=None, tta=False, cascade=None, lane='interactive', heatmap=False):
     try:
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        img = img.resize((IMG_SIZE, IMG_SIZE))
-        img_array = np.array(img, dtype=np.float32) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        interpreter.set_tensor(input_details[0]['index'], img_array)
-        interpreter.invoke()
-        prediction = interpreter.get_tensor(output_details[0]['index'])[0][0]
-        return float(prediction)
+        t0 = time.perf_counter()
+        img, original_size, conforming = decode_image(image_bytes)
+        if info is not None:
+            info['decode_ms'] = (time.perf_counter() - t0) * 1000
+            info['image_size'] = original_size
+            info['fast_path'] = conforming
+        resized = None
+        if QUALITY_MODE != 'off':
+            # Pre-screen pada gambar ukuran input model: biayanya tidak lagi
+            # sebanding jumlah piksel upload, dan resize ini dipakai ulang
+            # oleh model penuh (di luar slot, jadi tidak menahan interpreter)
+            t_resize = time.perf_counter()
+            resized = img if conforming else img.resize((IMG_SIZE, IMG_SIZE))
+            if info is not None:
+                info['resize_ms'] = (time.perf_counter() - t_resize) * 1000
+            prescreen(resized, info)
+        with scheduler.slot(lane) as queue_ms:
+            if info is not None:
+                info['queue_ms'] = queue_ms
+            prediction = score_image(img, conforming, info, tta, cascade, heatmap, resized, lane)
+        # Heatmap dihitung setelah slot dilepas; tidak butuh interpreter
+        if info is not None and info.get('feature_map') is not None:
+            t_heatmap = time.perf_counter()
+            cam = class_activation_map(info.pop('feature_map'), heatmap_head)
+            info['heatmap'] = {'overlay': encode_overlay(cam), 'grid': list(cam.shape)}
+            info['heatmap_ms'] = (time.perf_counter() - t_heatmap) * 1000
+        return prediction
+    except (QueueFull, ImageTooLarge, LowQualityImage, UnsupportedFormat):
+        raise
     except Exception as e:
         print(f"Prediction error: {e}")
         return None
@@ -52,22 +458,118 @@ def home():
     return jsonify({
         'service': 'Oral Cancer Detection API',
         'status': 'running',
-        'model_loaded': interpreter is not None
+        'model_loaded': model_loaded(),
+        'accepted_formats': ACCEPTED_FORMATS
+    })
+
+@app.route('/config', methods=['GET'])
+def config():
+    # Spesifikasi input model, supaya klien bisa mengirim gambar yang sudah
+    # sesuai dan server melewati resize/convert
+    return jsonify({
+        'input': {
+            'width': IMG_SIZE,
+            'height': IMG_SIZE,
+            'channels': 3,
+            'color_order': 'RGB',
+            'dtype': np.dtype(input_dtype).name,
+            'resize': 'stretch',
+            'normalization': 'none' if input_dtype == np.uint8 else 'server divides by 255'
+        },
+        'accepted_formats': ACCEPTED_FORMATS,
+        'decoders': {mime: decoder.name for mime, decoder in decoders.items()},
+        'options': {
+            'tta': tta_interpreter is not None,
+            'cascade': fast_interpreter is not None,
+            # Hanya store durable; dengan stand-in 'memory' frontend tetap
+            # mengunggah sendiri supaya data retraining tidak hilang
+            'persist': persist_queue is not None and persist_queue.store.durable,
+            'heatmap': heatmap_head is not None,
+            'quality': QUALITY_MODE
+        },
+        'model_loaded': model_loaded()
     })
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
+    status = {
         'status': 'healthy',
-        'model_loaded': interpreter is not None
+        'model_loaded': model_loaded()
+    }
+    if inference_pool is not None:
+        status['inference_pool'] = inference_pool.stats()
+        if status['inference_pool']['alive'] < inference_pool.workers:
+            # Proses inference sedang di-respawn; kapasitas berkurang
+            status['status'] = 'degraded'
+    if embedding_index is not None:
+        status['embedding_index'] = embedding_index.stats()
+    if persist_queue is not None:
+        status['persistence'] = persist_queue.stats()
+    if QUALITY_MODE != 'off':
+        status['quality'] = quality_stats.stats()
+    if decoder_report:
+        status['decoder_benchmark'] = decoder_report
+    status['scheduler'] = scheduler.stats()
+    status['memory'] = worker_memory.stats()
+    return jsonify(status)
+
+def check_admin_token():
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    if not check_admin_token():
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    try:
+        seconds = min(float(request.args.get('seconds', 10)), PROFILE_MAX_SECONDS)
+        interval = max(float(request.args.get('interval_ms', 5)), 1) / 1000
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid seconds/interval_ms'}), 400
+    # Profil hanya mencakup worker yang menerima request ini. Worker sync
+    # (satu thread) akan tertahan selama sampling dan tidak melayani
+    # request lain — tolak, jalankan gunicorn dengan --threads >= 2
+    if not request.environ.get('wsgi.multithread'):
+        return jsonify({'success': False,
+                        'error': 'Profiling requires a threaded worker (gunicorn --threads >= 2)'}), 409
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'success': False, 'error': 'Profiling already running'}), 409
+    try:
+        collapsed = SamplingProfiler(interval).run(seconds)
+    finally:
+        profile_lock.release()
+    return collapsed, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+@app.route('/admin/slow-requests', methods=['GET'])
+def admin_slow_requests():
+    if not check_admin_token():
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    return jsonify({
+        'threshold_ms': SLOW_REQUEST_MS or None,
+        'requests': slow_log.snapshot() if slow_log else []
     })
 
+@app.route('/admin/shadow', methods=['GET'])
+def admin_shadow():
+    if not check_admin_token():
+        return jsonify({'success': False, 'error': 'Not found'}), 404
+    return jsonify(shadow.stats() if shadow else {'enabled': False})
+
 @app.route('/predict', methods=['POST'])
+@app.route('/predict/bulk', methods=['POST'])
 def predict():
+    request_start = time.perf_counter()
+    bulk = request.path.endswith('/bulk') or request.headers.get('X-Priority', '').lower() == 'bulk'
+    lane = 'bulk' if bulk else 'interactive'
     try:
-        if interpreter is None:
+        if not model_loaded():
             return jsonify({'success': False, 'error': 'Model not loaded'}), 500
 
+        if request.content_length and request.content_length > MAX_UPLOAD_MB * 1024 * 1024:
+            return jsonify({'success': False, 'error': f'Payload larger than {MAX_UPLOAD_MB:g} MB'}), 413
+
         data = request.get_json()
         if not data or 'image' not in data:
             return jsonify({'success': False, 'error': 'No image provided'}), 400
@@ -77,18 +579,56 @@ def predict():
             image_data = image_data.split(',')[1]
 
         image_bytes = base64.b64decode(image_data)
-        prediction = predict_image(image_bytes)
+        use_tta = bool(data.get('tta')) and tta_interpreter is not None
+        use_heatmap = bool(data.get('heatmap')) and heatmap_head is not None
+        shadow_sample = shadow is not None and shadow.should_sample()
+        # Heatmap butuh output model penuh, jadi tahap cepat dilewati
+        use_cascade = fast_interpreter is not None and not use_tta and not use_heatmap
+        info = {} if (slow_log or use_tta or use_cascade or use_heatmap or embedding_index or shadow_sample
+                      or QUALITY_MODE == 'flag') else None
+        try:
+            prediction = predict_image(image_bytes, info, tta=use_tta, cascade=use_cascade, lane=lane,
+                                       heatmap=use_heatmap)
+        except QueueFull:
+            return jsonify({'success': False, 'error': f'Server busy ({lane} queue full)'}), 503, {'Retry-After': '1'}
+        except ImageTooLarge as e:
+            return jsonify({'success': False, 'error': f'Image too large ({e}), max {MAX_IMAGE_PIXELS} pixels'}), 413
+        except UnsupportedFormat as e:
+            return jsonify({
+                'success': False,
+                'error': f'Unsupported image format ({e})',
+                'accepted_formats': ACCEPTED_FORMATS
+            }), 415
+        except LowQualityImage as e:
+            # Tidak ada diagnosis untuk foto yang tidak layak; minta foto ulang
+            return jsonify({
+                'success': False,
+                'error': f'Image quality too low ({e})',
+                'quality': {'ok': False, 'issues': e.issues,
+                            'metrics': {k: round(v, 3) for k, v in e.metrics.items()}}
+            }), 422
 
         if prediction is None:
             return jsonify({'success': False, 'error': 'Prediction failed'}), 500
 
+        near_duplicate = None
+        if embedding_index is not None and info.get('embedding') is not None:
+            match = embedding_index.nearest(info['embedding'], NEAR_DUPLICATE_THRESHOLD)
+            if match:
+                # Index dipakai bersama semua pengguna: hasil dan key gambar
+                # lain (bisa path file pasien lain) tidak pernah dikembalikan
+                near_duplicate = {'similarity': match[1]}
+            else:
+                key = 'upload-' + hashlib.sha1(image_bytes).hexdigest()[:16]
+                embedding_index.add(key, info['embedding'], {'prediction': prediction})
+
         prob_non_cancer = prediction
         prob_cancer = 1 - prediction
 
         # =========================
         # Threshold konservatif
         # =========================
-        if prob_cancer >= 0.8:
+        if prob_cancer >= CANCER_THRESHOLD:
             is_cancer = True
             confidence = prob_cancer
 
@@ -97,7 +637,7 @@ def predict():
             else:
                 recommendation = "⚠️ Terdeteksi kemungkinan kanker mulut. Disarankan untuk konsultasi ke dokter gigi umum / spesialis penyakit mulut."
 
-        elif prob_cancer <= 0.4:
+        elif prob_cancer <= NORMAL_THRESHOLD:
             is_cancer = False
             confidence = prob_non_cancer
 
@@ -112,7 +652,20 @@ def predict():
             confidence = prob_non_cancer
             recommendation = "ℹ️ Hasil berada pada zona borderline. Disarankan evaluasi klinis langsung untuk memastikan kondisi lesi."
 
-        return jsonify({
+        if slow_log:
+            slow_log.record(
+                (time.perf_counter() - request_start) * 1000,
+                stages_ms={k: round(v, 2) for k, v in info.items() if k.endswith('_ms')},
+                image_size=info.get('image_size'),
+                tta=use_tta,
+                lane=lane,
+                stage=info.get('stage'),
+                fast_path=info.get('fast_path'),
+                payload_bytes=len(image_bytes),
+                payload_base64_bytes=len(image_data)
+            )
+
+        response = {
             'success': True,
             'prediction_value': float(prediction),
             'diagnosis': 'Cancer Detected' if is_cancer else 'Normal (Non-Cancer)',
@@ -124,14 +677,51 @@ def predict():
                 'sensitivity': 67.32,
                 'specificity': 99.67
             }
-        }), 200
+        }
+        if shadow_sample:
+            # Dibandingkan dengan tahap yang benar-benar menjawab request ini
+            shadow.submit(info['model_input'], float(prediction), 'tta' if use_tta else info['stage'])
+        if persist_queue is not None:
+            persist_queue.submit(image_bytes, float(prediction), {
+                'diagnosis': response['diagnosis'],
+                'confidence': response['confidence'],
+                'stage': info.get('stage') if info else 'full',
+                'tta': use_tta
+            })
+        if near_duplicate:
+            response['near_duplicate'] = near_duplicate
+        if use_cascade:
+            response['cascade'] = {
+                'stage': info['stage'],
+                'bounds': [CASCADE_LOW, CASCADE_HIGH]
+            }
+        if info is not None and 'quality' in info:
+            response['quality'] = info['quality']
+        if use_heatmap and info.get('heatmap'):
+            response['heatmap'] = dict(info['heatmap'], target='cancer')
+        if use_tta:
+            response['tta'] = {
+                'views': len(info['tta_scores']),
+                'aggregate': TTA_AGGREGATE,
+                'view_scores': info['tta_scores']
+            }
+        return jsonify(response), 200
 
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.after_request
+def recycle_if_over_budget(response):
+    # Hanya di bawah gunicorn; SIGTERM = graceful shutdown worker
+    under_gunicorn = request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')
+    worker_memory.check_budget(under_gunicorn)
+    return response
+
+
 print("Starting Oral Cancer Detection API...")
+initialize_decoders()
 initialize_model()
 
 if __name__ == '__main__':
@@ -0,0 +1,224 @@
+"""
+Skoring offline seluruh folder gambar dengan model TFLite saat ini
+
+Setiap worker proses memegang satu interpreter dengan input batch tetap,
+jadi gambar di-decode dan diskor per batch tanpa alokasi ulang tensor.
+
+Contoh:
+    python batch_score.py downloaded_dataset --output scores.csv
+    python batch_score.py downloaded_dataset --output scores.parquet --workers 8
+    python batch_score.py downloaded_dataset --output scores.csv --organize
+    python batch_score.py downloaded_dataset --embeddings embeddings.npz
+
+Dengan --organize, hasil skor dipakai organize_dataset() di
+download_from_drive.py untuk memindahkan gambar ke normal/cancer/uncertain,
+menggantikan persentase yang di-parse dari nama file.
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+MODEL_PATH = 'oral_cancer_model.tflite'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# State per proses worker (diisi oleh init_worker)
+_interpreter = None
+_input_details = None
+_prob_output = None
+_embedding_output = None
+_batch_size = None
+
+
+def init_worker(model_path, batch_size):
+    global _interpreter, _input_details, _prob_output, _embedding_output, _batch_size
+    import tensorflow as tf
+
+    # Satu thread per interpreter; paralelisme datang dari jumlah proses
+    _interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=1)
+    index = _interpreter.get_input_details()[0]['index']
+    shape = _interpreter.get_input_details()[0]['shape']
+    _interpreter.resize_tensor_input(index, [batch_size, shape[1], shape[2], shape[3]])
+    _interpreter.allocate_tensors()
+    _input_details = _interpreter.get_input_details()
+    outputs = _interpreter.get_output_details()
+    # Model dengan embedding_output=True punya output kedua (batch, dim)
+    _prob_output = next(d for d in outputs if d['shape'][-1] == 1)
+    _embedding_output = next((d for d in outputs if len(d['shape']) == 2 and d['shape'][-1] > 1), None)
+    _batch_size = batch_size
+
+
+def load_image(path, size):
+    # Sama dengan predict_image() di app.py
+    img = Image.open(path).convert('RGB')
+    return np.asarray(img.resize(size))
+
+
+def score_chunk(paths):
+    """
+    Skor daftar path dalam batch sebesar _batch_size. Batch terakhir
+    di-pad dengan nol supaya bentuk tensor tidak berubah
+    """
+    _, height, width, channels = _input_details[0]['shape']
+    dtype = _input_details[0]['dtype']
+    results = []
+
+    for start in range(0, len(paths), _batch_size):
+        batch_paths = paths[start:start + _batch_size]
+        batch = np.zeros((_batch_size, height, width, channels), dtype=np.uint8)
+        valid = []
+        for i, path in enumerate(batch_paths):
+            try:
+                batch[i] = load_image(path, (int(width), int(height)))
+                valid.append(i)
+            except Exception as e:
+                results.append((path, None, str(e), None))
+
+        if not valid:
+            continue
+        if dtype == np.uint8:
+            model_input = batch
+        else:
+            model_input = batch.astype(np.float32) / 255.0
+        _interpreter.set_tensor(_input_details[0]['index'], model_input)
+        _interpreter.invoke()
+        scores = _interpreter.get_tensor(_prob_output['index'])[:, 0]
+        embeddings = None
+        if _embedding_output is not None:
+            embeddings = _interpreter.get_tensor(_embedding_output['index']).astype(np.float32)
+        for i in valid:
+            # Output model = probabilitas non-kanker
+            embedding = embeddings[i] if embeddings is not None else None
+            results.append((batch_paths[i], 1.0 - float(scores[i]), None, embedding))
+
+    return results
+
+
+def list_images(directory, recursive=False):
+    paths = []
+    if recursive:
+        for root, _, files in os.walk(directory):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    else:
+        paths = [os.path.join(directory, f) for f in os.listdir(directory)
+                 if f.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(paths)
+
+
+def score_directory(directory, model_path=MODEL_PATH, workers=None, batch_size=16,
+                    chunk_size=256, recursive=False):
+    """
+    Skor semua gambar di folder. Return list (path, prob_cancer, error, embedding)
+    """
+    paths = list_images(directory, recursive)
+    workers = workers or os.cpu_count()
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    print(f"🔍 {len(paths)} gambar, {workers} worker, batch {batch_size}")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(model_path, batch_size)) as pool:
+        for chunk_results in pool.map(score_chunk, chunks):
+            results.extend(chunk_results)
+            elapsed = time.perf_counter() - start
+            print(f"  {len(results)}/{len(paths)} ({len(results) / elapsed * 3600:,.0f} gambar/jam)")
+
+    elapsed = time.perf_counter() - start
+    if paths:
+        print(f"✓ Selesai dalam {elapsed:.1f} detik ({len(paths) / elapsed * 3600:,.0f} gambar/jam)")
+    return results
+
+
+def write_scores(results, output, model_path):
+    rows = [{
+        'filename': os.path.basename(path),
+        'path': path,
+        'prob_cancer': prob_cancer,
+        'prediction_percentage': round(prob_cancer * 100) if prob_cancer is not None else None,
+        'model': os.path.basename(model_path),
+        'error': error or '',
+    } for path, prob_cancer, error, _ in results]
+
+    if output.endswith('.parquet'):
+        import pandas as pd  # butuh pandas + pyarrow
+        pd.DataFrame(rows).to_parquet(output, index=False)
+    else:
+        with open(output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ['filename'])
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f"✓ Skor disimpan: {output}")
+
+
+def write_embeddings(results, output):
+    """
+    Simpan embedding sebagai EmbeddingIndex (key = path gambar), untuk
+    dedupe data training atau sebagai index awal EMBEDDING_INDEX_PATH di app.py
+    """
+    from embedding_index import EmbeddingIndex
+
+    rows = [r for r in results if r[3] is not None]
+    if not rows:
+        print("⚠️  Model tidak punya output embedding (ekspor dengan embedding_output=True)")
+        return
+    index = EmbeddingIndex(len(rows[0][3]), capacity=len(rows))
+    for path, prob_cancer, _, embedding in rows:
+        index.add(path, embedding, {'prediction': 1.0 - prob_cancer})
+    index.save(output)
+    print(f"✓ {index.size} embedding disimpan: {output}")
+
+
+def load_scores(path):
+    """
+    Baca file skor (CSV/Parquet) menjadi {filename: prediction_percentage}
+    """
+    if path.endswith('.parquet'):
+        import pandas as pd
+        rows = pd.read_parquet(path).to_dict('records')
+    else:
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    scores = {}
+    for row in rows:
+        percentage = row.get('prediction_percentage')
+        if percentage in (None, ''):
+            continue
+        scores[row['filename']] = int(float(percentage))
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory')
+    parser.add_argument('--output', default='scores.csv', help='.csv atau .parquet')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--workers', type=int, help='default: jumlah CPU')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--chunk-size', type=int, default=256, help='gambar per tugas worker')
+    parser.add_argument('--recursive', action='store_true')
+    parser.add_argument('--embeddings', help='simpan embedding ke file .npz (EmbeddingIndex)')
+    parser.add_argument('--organize', action='store_true',
+                        help='pindahkan gambar ke normal/cancer/uncertain berdasarkan skor')
+    parser.add_argument('--threshold', type=int, default=50, help='threshold organize (%%)')
+    args = parser.parse_args()
+
+    results = score_directory(args.directory, args.model, args.workers, args.batch_size,
+                              args.chunk_size, args.recursive)
+    write_scores(results, args.output, args.model)
+    if args.embeddings:
+        write_embeddings(results, args.embeddings)
+
+    if args.organize:
+        from download_from_drive import DriveDataDownloader
+        DriveDataDownloader().organize_dataset(args.directory, args.threshold,
+                                               scores=load_scores(args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Benchmark offline mode inferensi app.py pada dataset berlabel
+
+Struktur folder sama dengan DATA_DIR di train_model.py:
+    dataset/cancer/*.jpg
+    dataset/normal/*.jpg
+
+Contoh:
+    python benchmark.py dataset --modes single,tta,cascade
+    python benchmark.py dataset --modes single,heatmap
+
+Untuk setiap mode dicetak latensi (p50/p99, end-to-end predict_image)
+dan sensitivitas/spesifisitas, beserta selisihnya terhadap mode pertama.
+Mode cascade juga mencetak porsi gambar yang dijawab tiap tahap dan
+penghematan waktu rata-rata dibanding mode pertama. Mode heatmap mencetak
+waktu rata-rata perhitungan CAM + encode overlay.
+"""
+
+import argparse
+import json
+import os
+import time
+
+# Semua mode opsional harus aktif sebelum app.py di-import
+os.environ.setdefault('TTA_ENABLED', '1')
+os.environ.setdefault('CASCADE_ENABLED', '1')
+
+import numpy as np
+
+import app
+
+# Sama dengan rule "Cancer Detected" di app.predict()
+CANCER_THRESHOLD = 0.8
+
+
+def predict_single(image_bytes, info):
+    return app.predict_image(image_bytes, info, cascade=False)
+
+
+def predict_tta(image_bytes, info):
+    return app.predict_image(image_bytes, info, tta=True, cascade=False)
+
+
+def predict_cascade(image_bytes, info):
+    if app.fast_interpreter is None:
+        raise SystemExit(f"Mode cascade butuh {app.FAST_MODEL_PATH}")
+    return app.predict_image(image_bytes, info, cascade=True)
+
+
+def predict_heatmap(image_bytes, info):
+    if app.heatmap_head is None:
+        raise SystemExit(f"Mode heatmap butuh model dengan output feature map dan {app.HEATMAP_HEAD_PATH}")
+    return app.predict_image(image_bytes, info, cascade=False, heatmap=True)
+
+
+# Nama mode -> fungsi yang mengembalikan prediction_value (prob non-kanker)
+MODES = {
+    'single': predict_single,
+    'tta': predict_tta,
+    'cascade': predict_cascade,
+    'heatmap': predict_heatmap,
+}
+
+
+def load_dataset(data_dir, limit=None):
+    samples = []
+    for label, class_name in ((1, 'cancer'), (0, 'normal')):
+        class_dir = os.path.join(data_dir, class_name)
+        files = sorted(f for f in os.listdir(class_dir)
+                       if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+        for filename in files[:limit]:
+            with open(os.path.join(class_dir, filename), 'rb') as f:
+                samples.append((f.read(), label))
+    return samples
+
+
+def screening_metrics(labels, prob_cancer, threshold):
+    labels = np.asarray(labels)
+    predicted = np.asarray(prob_cancer) >= threshold
+    tp = np.sum(predicted & (labels == 1))
+    tn = np.sum(~predicted & (labels == 0))
+    positives, negatives = np.sum(labels == 1), np.sum(labels == 0)
+    return {
+        'accuracy': float((tp + tn) / len(labels) * 100),
+        'sensitivity': float(tp / positives * 100) if positives else None,
+        'specificity': float(tn / negatives * 100) if negatives else None,
+    }
+
+
+def run_mode(name, samples, threshold, warmup=3):
+    fn = MODES[name]
+    for image_bytes, _ in samples[:warmup]:
+        fn(image_bytes, {})
+
+    latencies, prob_cancer, labels, stages, heatmap_ms = [], [], [], [], []
+    for image_bytes, label in samples:
+        info = {}
+        start = time.perf_counter()
+        prediction = fn(image_bytes, info)
+        latencies.append((time.perf_counter() - start) * 1000)
+        stages.append(info.get('stage', 'full'))
+        if 'heatmap_ms' in info:
+            heatmap_ms.append(info['heatmap_ms'])
+        if prediction is None:
+            continue
+        prob_cancer.append(1 - prediction)
+        labels.append(label)
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    result = {
+        'mode': name,
+        'images': len(samples),
+        'latency_ms_p50': float(p50),
+        'latency_ms_p99': float(p99),
+        'latency_ms_mean': float(np.mean(latencies)),
+        'stage_fast_fraction': stages.count('fast') / len(stages),
+        'heatmap_ms_mean': float(np.mean(heatmap_ms)) if heatmap_ms else None,
+    }
+    result.update(screening_metrics(labels, prob_cancer, threshold))
+    return result
+
+
+def print_table(results):
+    base = results[0]
+    print("\n" + "="*90)
+    print(f"{'mode':<12}{'p50 ms':>10}{'p99 ms':>10}{'+ms p50':>10}"
+          f"{'sens %':>10}{'Δsens':>8}{'spec %':>10}{'Δspec':>8}{'acc %':>10}")
+    print("="*90)
+    for r in results:
+        def delta(key):
+            if r[key] is None or base[key] is None:
+                return '-'
+            return f"{r[key] - base[key]:+.2f}"
+        sens = f"{r['sensitivity']:.2f}" if r['sensitivity'] is not None else '-'
+        spec = f"{r['specificity']:.2f}" if r['specificity'] is not None else '-'
+        print(f"{r['mode']:<12}{r['latency_ms_p50']:>10.2f}{r['latency_ms_p99']:>10.2f}"
+              f"{r['latency_ms_p50'] - base['latency_ms_p50']:>+10.2f}"
+              f"{sens:>10}{delta('sensitivity'):>8}{spec:>10}{delta('specificity'):>8}"
+              f"{r['accuracy']:>10.2f}")
+    print("="*90)
+    for r in results:
+        if r['stage_fast_fraction'] == 0:
+            continue
+        saved = 1 - r['latency_ms_mean'] / base['latency_ms_mean']
+        print(f"{r['mode']}: {r['stage_fast_fraction'] * 100:.1f}% dijawab tahap pertama, "
+              f"waktu rata-rata {saved * 100:+.1f}% lebih hemat dibanding {base['mode']}")
+    for r in results:
+        if r['heatmap_ms_mean'] is None:
+            continue
+        added = r['latency_ms_mean'] - base['latency_ms_mean']
+        print(f"{r['mode']}: CAM + overlay {r['heatmap_ms_mean']:.2f} ms rata-rata, "
+              f"total {added:+.2f} ms dibanding {base['mode']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('data_dir')
+    parser.add_argument('--modes', default='single,tta,cascade', help=f"pilihan: {','.join(MODES)}")
+    parser.add_argument('--threshold', type=float, default=CANCER_THRESHOLD,
+                        help='prob kanker minimum untuk dihitung positif')
+    parser.add_argument('--limit', type=int, help='maksimum gambar per kelas')
+    parser.add_argument('--output', help='simpan hasil sebagai JSON')
+    args = parser.parse_args()
+
+    if app.interpreter is None:
+        raise SystemExit(f"Model tidak dapat dimuat: {app.MODEL_PATH}")
+
+    samples = load_dataset(args.data_dir, args.limit)
+    print(f"📦 {len(samples)} gambar dari {args.data_dir}")
+
+    results = [run_mode(name, samples, args.threshold) for name in args.modes.split(',')]
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'threshold': args.threshold, 'results': results}, f, indent=2)
+        print(f"✓ Hasil disimpan: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
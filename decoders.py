@@ -0,0 +1,209 @@
+"""
+Backend decoder gambar untuk predict_image() yang dipilih per format
+dengan micro-benchmark saat startup
+
+Backend (yang tidak ter-install dilewati):
+    pillow      selalu ada; JPEG/PNG, WebP/AVIF jika build Pillow mendukung
+    turbojpeg   PyTurboJPEG (libjpeg-turbo), JPEG saja
+    opencv      cv2.imdecode, JPEG/PNG/WebP (AVIF tergantung build)
+
+Untuk setiap format, sampel sintetis di-encode dengan Pillow lalu
+di-decode oleh semua backend yang mendukung. Backend hanya boleh dipilih
+jika pikselnya praktis sama dengan Pillow (decoder yang dipakai saat
+training), lalu yang tercepat menang.
+
+Format yang diterima API ditentukan oleh Pillow saja: header selalu dibaca
+dengan Image.open (cek ukuran sebelum decode penuh), jadi backend lain hanya
+mempercepat decode format yang sudah didukung Pillow.
+
+Contoh (lihat hasil benchmark di host ini):
+    python decoders.py
+"""
+
+import io
+import time
+
+import numpy as np
+from PIL import Image, features
+
+# MIME -> nama format Pillow untuk encode sampel benchmark
+PILLOW_FORMATS = {
+    'image/jpeg': 'JPEG',
+    'image/png': 'PNG',
+    'image/webp': 'WEBP',
+    'image/avif': 'AVIF',
+}
+# Rata-rata selisih piksel maksimum terhadap Pillow (IDCT bisa beda sedikit)
+MAX_MEAN_ABS_DIFF = 1.0
+# Tag EXIF Orientation
+EXIF_ORIENTATION = 0x0112
+
+
+def sniff_format(image_bytes):
+    """MIME dari magic bytes, None jika bukan format yang dikenal"""
+    if image_bytes[:3] == b'\xff\xd8\xff':
+        return 'image/jpeg'
+    if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'image/webp'
+    if image_bytes[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return None
+
+
+def _pillow_supports(feature):
+    try:
+        return bool(features.check(feature))
+    except ValueError:
+        # Pillow lama tidak mengenal nama fitur ini
+        return False
+
+
+class PillowDecoder:
+    name = 'pillow'
+
+    def __init__(self):
+        self.formats = {'image/jpeg', 'image/png'}
+        if _pillow_supports('webp'):
+            self.formats.add('image/webp')
+        if _pillow_supports('avif'):
+            self.formats.add('image/avif')
+
+    def decode(self, image_bytes, opened=None):
+        # opened: hasil Image.open yang sudah dipakai untuk cek ukuran
+        img = opened if opened is not None else Image.open(io.BytesIO(image_bytes))
+        img.load()
+        return img
+
+
+class TurboJpegDecoder:
+    name = 'turbojpeg'
+    formats = {'image/jpeg'}
+
+    def __init__(self):
+        from turbojpeg import TJPF_RGB, TurboJPEG
+        self._jpeg = TurboJPEG()
+        self._pixel_format = TJPF_RGB
+
+    def decode(self, image_bytes, opened=None):
+        return Image.fromarray(self._jpeg.decode(image_bytes, pixel_format=self._pixel_format))
+
+
+class OpenCVDecoder:
+    name = 'opencv'
+
+    def __init__(self):
+        import cv2
+        self._cv2 = cv2
+        # haveImageWriter cukup dengan ekstensi; codec yang bisa encode juga bisa decode
+        self.formats = {'image/jpeg', 'image/png'}
+        for mime, ext in (('image/webp', '.webp'), ('image/avif', '.avif')):
+            if cv2.haveImageWriter(ext):
+                self.formats.add(mime)
+
+    def decode(self, image_bytes, opened=None):
+        # imdecode memutar gambar sesuai EXIF Orientation; Pillow tidak
+        flags = self._cv2.IMREAD_COLOR | self._cv2.IMREAD_IGNORE_ORIENTATION
+        bgr = self._cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), flags)
+        if bgr is None:
+            raise ValueError("OpenCV could not decode image")
+        return Image.fromarray(self._cv2.cvtColor(bgr, self._cv2.COLOR_BGR2RGB))
+
+
+def available_decoders():
+    decoders = [PillowDecoder()]
+    for cls in (TurboJpegDecoder, OpenCVDecoder):
+        try:
+            decoders.append(cls())
+        except Exception:
+            # Library opsional tidak ter-install (atau libjpeg-turbo tidak ditemukan)
+            pass
+    return decoders
+
+
+def accepted_formats(decoders):
+    pillow = next(d for d in decoders if d.name == 'pillow')
+    return [mime for mime in PILLOW_FORMATS if mime in pillow.formats]
+
+
+def sample_image(mime, size=(640, 480), seed=0, orientation=None):
+    """
+    Foto sintetis (gradien + noise) di-encode dengan Pillow; None jika encoder tidak ada.
+    orientation: nilai tag EXIF Orientation (mis. 6 = putar 90°) seperti foto ponsel
+    """
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size[1], 0:size[0]]
+    base = np.stack([128 + 100 * np.sin(x / 97), 90 + 60 * np.cos(y / 61), 100 + 50 * np.sin((x + y) / 143)], -1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    options = {'quality': 85}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = orientation
+        options['exif'] = exif
+    try:
+        Image.fromarray(pixels).save(buffer, format=PILLOW_FORMATS[mime], **options)
+    except (KeyError, OSError, ValueError):
+        return None
+    return buffer.getvalue()
+
+
+def _time_decode(decoder, image_bytes, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        decoder.decode(image_bytes)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings)) * 1000
+
+
+def select_decoders(decoders, formats, runs=15):
+    """
+    Return ({mime: decoder}, {mime: {nama backend: median ms atau alasan}})
+    """
+    pillow = decoders[0]
+    selected, report = {}, {}
+    for mime in formats:
+        candidates = [d for d in decoders if mime in d.formats]
+        if len(candidates) == 1:
+            selected[mime], report[mime] = candidates[0], {candidates[0].name: 'only candidate'}
+            continue
+        sample = sample_image(mime)
+        if sample is None:
+            selected[mime], report[mime] = candidates[0], {candidates[0].name: 'no sample encoder'}
+            continue
+        # Sampel kedua membawa EXIF Orientation: backend yang memutar gambar
+        # (Pillow tidak) menghasilkan ukuran berbeda dan tidak dipilih
+        parity_samples = [data for data in (sample, sample_image(mime, orientation=6)) if data is not None]
+        references = [np.asarray(pillow.decode(data).convert('RGB'), dtype=np.int16) for data in parity_samples] \
+            if mime in pillow.formats else None
+        timings = {}
+        for decoder in candidates:
+            try:
+                decoded = [np.asarray(decoder.decode(data).convert('RGB'), dtype=np.int16)
+                           for data in parity_samples]
+            except Exception as e:
+                timings[decoder.name] = f'error: {e}'
+                continue
+            if references is not None and any(
+                    out.shape != ref.shape or np.abs(out - ref).mean() > MAX_MEAN_ABS_DIFF
+                    for out, ref in zip(decoded, references)):
+                timings[decoder.name] = 'output differs from pillow'
+                continue
+            timings[decoder.name] = _time_decode(decoder, sample, runs)
+        measured = {name: ms for name, ms in timings.items() if isinstance(ms, float)}
+        best = min(measured, key=measured.get) if measured else candidates[0].name
+        selected[mime] = next(d for d in candidates if d.name == best)
+        report[mime] = {name: round(ms, 3) if isinstance(ms, float) else ms for name, ms in timings.items()}
+    return selected, report
+
+
+if __name__ == '__main__':
+    backends = available_decoders()
+    print(f"Backend: {', '.join(d.name for d in backends)}")
+    selected, report = select_decoders(backends, accepted_formats(backends))
+    for mime, timings in report.items():
+        details = ', '.join(f"{name}={ms} ms" if isinstance(ms, float) else f"{name}: {ms}"
+                            for name, ms in timings.items())
+        print(f"{mime:<12} -> {selected[mime].name:<10} ({details})")
@@ -135,9 +135,11 @@ class DriveDataDownloader:
             pass
         return None
     
-    def organize_dataset(self, source_dir, threshold=50):
+    def organize_dataset(self, source_dir, threshold=50, scores=None):
         """
         Organize images ke folder normal/cancer berdasarkan prediction
+        scores: {filename: persentase kanker} dari batch_score.py; jika
+        diberikan, dipakai sebagai pengganti persentase di nama file
         """
         print(f"\n📁 Organizing dataset (threshold: {threshold}%)...")
         
@@ -157,8 +159,11 @@ class DriveDataDownloader:
             
             filepath = os.path.join(source_dir, filename)
             
-            # Parse prediction dari filename
-            percentage = self.parse_filename(filename)
+            # Skor model saat ini jika ada, fallback ke parse dari filename
+            if scores is not None:
+                percentage = scores.get(filename)
+            else:
+                percentage = self.parse_filename(filename)
             
             if percentage is None:
                 # Tidak bisa parse, masuk uncertain
@@ -291,11 +296,25 @@ class DriveDataDownloader:
         # Validate images
         self.validate_images(output_dir)
         
+        # Pre-screen kualitas (blur, eksposur, bukan foto intraoral)
+        screen = input("Move low-quality images to low_quality/? (y/n): ")
+        if screen.lower() == 'y':
+            from quality import filter_directory
+            filter_directory(output_dir, move_to=os.path.join(output_dir, 'low_quality'),
+                             report=os.path.join(output_dir, 'quality.csv'))
+        
         # Organize dataset
         print("\n" + "="*50)
         organize = input("Organize dataset into normal/cancer folders? (y/n): ")
         if organize.lower() == 'y':
-            self.organize_dataset(output_dir)
+            scores = None
+            rescore = input("Re-score images with the current TFLite model? (y/n): ")
+            if rescore.lower() == 'y':
+                from batch_score import score_directory, write_scores, load_scores
+                scores_path = os.path.join(output_dir, 'scores.csv')
+                write_scores(score_directory(output_dir), scores_path, 'oral_cancer_model.tflite')
+                scores = load_scores(scores_path)
+            self.organize_dataset(output_dir, scores=scores)
         
         print("\n" + "="*50)
         print("✨ Download Complete!")
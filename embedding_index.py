@@ -0,0 +1,217 @@
+"""
+Index nearest-neighbour untuk embedding MobileNetV2 (output
+GlobalAveragePooling2D) dari model yang diekspor dengan embedding_output=True
+
+Embedding disimpan dalam satu array float32 (capacity, dim) yang sudah
+dinormalisasi, jadi pencarian cosine cukup satu perkalian matriks.
+Jika penuh, entri yang paling lama tidak dipakai (LRU) diganti.
+
+Contoh (dedupe data training sebelum retraining):
+    python batch_score.py downloaded_dataset --embeddings embeddings.npz
+    python embedding_index.py dedupe embeddings.npz --threshold 0.97
+    python embedding_index.py dedupe embeddings.npz --move downloaded_dataset/duplicates
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+
+class EmbeddingIndex:
+    def __init__(self, dim, capacity=10000):
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.keys = [None] * capacity
+        self.metadata = [None] * capacity
+        self.size = 0
+        self.evictions = 0
+        self.version = 0  # bertambah setiap add, untuk menandai perlu disimpan
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add(self, key, vector, metadata=None):
+        vector = self._normalize(vector).reshape(self.dim)
+        with self._lock:
+            if key in self._positions:
+                slot = self._positions[key]
+            elif self.size < self.capacity:
+                slot = self.size
+                self.size += 1
+            else:
+                slot = int(np.argmin(self.last_used))
+                del self._positions[self.keys[slot]]
+                self.evictions += 1
+            self.vectors[slot] = vector
+            self.last_used[slot] = time.time()
+            self.keys[slot] = key
+            self.metadata[slot] = metadata
+            self._positions[key] = slot
+            self.version += 1
+
+    def search(self, vector, k=1):
+        """
+        Return list (key, similarity, metadata) untuk k tetangga terdekat
+        """
+        query = self._normalize(vector).reshape(self.dim)
+        with self._lock:
+            if self.size == 0:
+                return []
+            similarities = self.vectors[:self.size] @ query
+            k = min(k, self.size)
+            top = np.argpartition(-similarities, k - 1)[:k]
+            top = top[np.argsort(-similarities[top])]
+            self.last_used[top] = time.time()
+            return [(self.keys[i], float(similarities[i]), self.metadata[i]) for i in top]
+
+    def nearest(self, vector, threshold):
+        """Tetangga terdekat jika similarity >= threshold, selain itu None"""
+        results = self.search(vector, k=1)
+        if results and results[0][1] >= threshold:
+            return results[0]
+        return None
+
+    def duplicate_groups(self, threshold, block_size=1024):
+        """
+        Kelompokkan entri yang saling mirip (>= threshold). Similarity
+        dihitung per blok supaya memori tetap O(block_size * size)
+        """
+        with self._lock:
+            vectors = self.vectors[:self.size].copy()
+            keys = self.keys[:self.size]
+        parent = np.arange(len(vectors))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for start in range(0, len(vectors), block_size):
+            block = vectors[start:start + block_size] @ vectors.T
+            rows, cols = np.nonzero(block >= threshold)
+            for row, col in zip(rows + start, cols):
+                if row < col:
+                    parent[find(col)] = find(row)
+
+        groups = {}
+        for i in range(len(vectors)):
+            groups.setdefault(find(i), []).append(keys[i])
+        return [group for group in groups.values() if len(group) > 1]
+
+    def save(self, path, merge=False):
+        """
+        merge=True: gabungkan dengan file yang sudah ada (beberapa worker
+        gunicorn menyimpan ke file yang sama), entri yang paling baru dipakai
+        menang dan total dibatasi capacity
+        """
+        # Salin di dalam lock, tulis ke disk di luar lock supaya pencarian
+        # dari request tidak tertahan selama I/O
+        with self._lock:
+            vectors = self.vectors[:self.size].copy()
+            last_used = self.last_used[:self.size].copy()
+            keys = self.keys[:self.size]
+            metadata = self.metadata[:self.size]
+        if not merge:
+            self._write(path, vectors, last_used, keys, metadata)
+            return
+
+        import fcntl
+        with open(path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if os.path.exists(path):
+                data = np.load(path)
+                vectors = np.concatenate([vectors, data['vectors']])
+                last_used = np.concatenate([last_used, data['last_used']])
+                keys = keys + json.loads(str(data['keys']))
+                metadata = metadata + json.loads(str(data['metadata']))
+            newest = {}
+            for i in np.argsort(-last_used):
+                if len(newest) == self.capacity:
+                    break
+                newest.setdefault(keys[i], i)
+            order = list(newest.values())
+            self._write(path, vectors[order], last_used[order],
+                        [keys[i] for i in order], [metadata[i] for i in order])
+
+    def _write(self, path, vectors, last_used, keys, metadata):
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, vectors=vectors, last_used=last_used, keys=np.array(json.dumps(keys)),
+                 metadata=np.array(json.dumps(metadata)), capacity=self.capacity)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        data = np.load(path)
+        vectors = data['vectors']
+        capacity = capacity or int(data['capacity'])
+        index = cls(vectors.shape[1], capacity)
+        keys = json.loads(str(data['keys']))
+        metadata = json.loads(str(data['metadata']))
+        # Jika capacity baru lebih kecil, simpan entri yang paling baru dipakai
+        order = np.argsort(-data['last_used'])[:capacity]
+        for slot, i in enumerate(order):
+            index.vectors[slot] = vectors[i]
+            index.last_used[slot] = data['last_used'][i]
+            index.keys[slot] = keys[i]
+            index.metadata[slot] = metadata[i]
+            index._positions[keys[i]] = slot
+        index.size = len(order)
+        return index
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'capacity': self.capacity,
+            'evictions': self.evictions,
+            'memory_mb': round(self.vectors.nbytes / (1024 * 1024), 2),
+        }
+
+
+def dedupe(args):
+    index = EmbeddingIndex.load(args.index)
+    groups = index.duplicate_groups(args.threshold)
+    duplicates = sum(len(group) - 1 for group in groups)
+    print(f"🔍 {index.size} embedding, {len(groups)} grup near-duplicate "
+          f"({duplicates} gambar duplikat, threshold {args.threshold})")
+
+    for group in groups:
+        print(f"  {group[0]} ← {', '.join(os.path.basename(k) for k in group[1:])}")
+
+    if args.move:
+        os.makedirs(args.move, exist_ok=True)
+        for group in groups:
+            # Simpan gambar pertama, pindahkan sisanya
+            for key in group[1:]:
+                if os.path.exists(key):
+                    shutil.move(key, os.path.join(args.move, os.path.basename(key)))
+        print(f"✓ {duplicates} duplikat dipindahkan ke {args.move}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    dedupe_parser = subparsers.add_parser('dedupe', help='cari gambar near-duplicate')
+    dedupe_parser.add_argument('index', help='file .npz dari batch_score.py --embeddings')
+    dedupe_parser.add_argument('--threshold', type=float, default=0.97)
+    dedupe_parser.add_argument('--move', help='pindahkan duplikat ke folder ini')
+    args = parser.parse_args()
+
+    if args.command == 'dedupe':
+        dedupe(args)
+
+
+if __name__ == '__main__':
+    main()
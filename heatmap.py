@@ -0,0 +1,64 @@
+"""
+Heatmap lesi (class activation map) dari invoke yang sama dengan prediksi
+
+Model yang diekspor dengan heatmap_output=True (train_model.py) punya output
+feature map conv terakhir (h, w, c), dan bobot head Dense disimpan di
+<model>_head.npz. Karena head = GlobalAveragePooling2D -> Dense..., gradien
+logit terhadap vektor hasil pooling bisa dihitung langsung dari bobot head
+dengan NumPy (sama dengan bobot Grad-CAM), tanpa pass gradien di TF.
+"""
+
+import base64
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def load_head(path):
+    """Return [(W0, b0), (W1, b1), ...] sesuai urutan layer Dense"""
+    with np.load(path) as data:
+        count = len([k for k in data.files if k.startswith('W')])
+        return [(data[f'W{i}'].astype(np.float32), data[f'b{i}'].astype(np.float32))
+                for i in range(count)]
+
+
+def logit_gradient(pooled, head):
+    """
+    d logit / d pooled untuk head Dense(relu)... -> Dense(1, sigmoid).
+    Dropout tidak aktif saat inference, jadi tidak ikut dihitung.
+    """
+    h, masks = pooled, []
+    for W, b in head[:-1]:
+        z = h @ W + b
+        masks.append(z > 0)
+        h = np.where(masks[-1], z, 0)
+    grad = head[-1][0][:, 0]
+    for (W, _), mask in zip(reversed(head[:-1]), reversed(masks)):
+        grad = W @ (grad * mask)
+    return grad
+
+
+def class_activation_map(feature_map, head):
+    """
+    feature_map: (h, w, c) float. Return peta (h, w) dalam [0, 1] untuk
+    kelas kanker. Output model = prob non-kanker, jadi arah kanker = -gradien.
+    """
+    feature_map = np.asarray(feature_map, dtype=np.float32)
+    weights = -logit_gradient(feature_map.mean(axis=(0, 1)), head)
+    cam = np.maximum(feature_map @ weights, 0)
+    peak = cam.max()
+    return cam / peak if peak > 0 else cam
+
+
+def encode_overlay(cam):
+    """
+    PNG RGBA seukuran grid feature map (mis. 7x7, ~100 byte): merah dengan
+    alpha = intensitas. Klien cukup merentangkannya di atas foto.
+    """
+    rgba = np.zeros(cam.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = 255
+    rgba[..., 3] = np.round(cam * 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(rgba, 'RGBA').save(buffer, format='PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode()
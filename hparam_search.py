@@ -0,0 +1,305 @@
+"""
+Pencarian hyperparameter paralel dengan early stopping ala ASHA
+
+Setiap proses worker mengambil trial berikutnya dari store SQLite lokal
+(search/search.db), melatihnya epoch demi epoch, dan di setiap rung
+(min_epochs * eta^k epoch) membandingkan val AUC-nya dengan semua trial
+lain yang sudah mencapai rung yang sama. Trial hanya lanjut jika masuk
+1/eta teratas; sisanya dihentikan. Tidak ada koordinator: keputusan rung
+diambil di dalam transaksi SQLite, jadi aman untuk banyak proses.
+
+Store bisa dilanjutkan: trial yang terputus (status running) kembali ke
+antrian dan melanjutkan dari bobot epoch terakhirnya.
+
+Contoh:
+    python train_model.py --search --search-trials 24 --search-workers 4
+    python train_model.py --export-best            # trial terbaik -> convert_to_tflite()
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+
+import tensorflow as tf
+
+from train_model import EPOCHS, IMG_SIZE, convert_to_tflite, create_model, prepare_data
+
+SEARCH_DIR = 'search'
+# Total epoch sama dengan train_model(): EPOCHS frozen + 10 fine-tune
+MAX_EPOCHS = EPOCHS + 10
+MIN_EPOCHS = 2
+ETA = 3
+
+# (jenis, parameter) per hyperparameter; default train_model() ada di dalam rentang
+SEARCH_SPACE = {
+    'learning_rate': ('log', 1e-4, 3e-3),
+    'fine_tune_lr': ('log', 1e-6, 1e-4),
+    'dropout1': ('uniform', 0.2, 0.6),
+    'dropout2': ('uniform', 0.1, 0.5),
+    'unfreeze_layers': ('choice', [10, 20, 30, 50]),
+    'batch_size': ('choice', [16, 32, 64]),
+    'head_epochs': ('choice', [5, 10, 20]),
+}
+
+
+def sample_config(rng):
+    config = {}
+    for name, (kind, *params) in SEARCH_SPACE.items():
+        if kind == 'log':
+            config[name] = math.exp(rng.uniform(math.log(params[0]), math.log(params[1])))
+        elif kind == 'uniform':
+            config[name] = rng.uniform(params[0], params[1])
+        else:
+            config[name] = rng.choice(params[0])
+    return config
+
+
+def rungs_for(min_epochs=MIN_EPOCHS, max_epochs=MAX_EPOCHS, eta=ETA):
+    rungs, r = [], min_epochs
+    while r < max_epochs:
+        rungs.append(r)
+        r *= eta
+    return rungs
+
+
+class TrialStore:
+    """
+    Store trial di SQLite. Satu koneksi per operasi supaya aman dipakai dari
+    beberapa proses; operasi yang harus atomik memakai BEGIN IMMEDIATE.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS trials (
+                    id INTEGER PRIMARY KEY,
+                    config TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    epochs_done INTEGER NOT NULL DEFAULT 0,
+                    final_metric REAL,
+                    updated REAL
+                );
+                CREATE TABLE IF NOT EXISTS epochs (
+                    trial_id INTEGER, epoch INTEGER, val_auc REAL, val_loss REAL, seconds REAL,
+                    PRIMARY KEY (trial_id, epoch)
+                );
+                CREATE TABLE IF NOT EXISTS rungs (
+                    trial_id INTEGER, rung INTEGER, metric REAL,
+                    PRIMARY KEY (trial_id, rung)
+                );
+            ''')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM trials').fetchone()[0]
+
+    def add_trials(self, configs):
+        with self._connect() as conn:
+            conn.executemany('INSERT INTO trials (config, updated) VALUES (?, ?)',
+                             [(json.dumps(c), time.time()) for c in configs])
+
+    def reset_running(self):
+        """Trial yang terputus di run sebelumnya kembali ke antrian"""
+        with self._connect() as conn:
+            return conn.execute("UPDATE trials SET status = 'pending' WHERE status = 'running'").rowcount
+
+    def claim(self):
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT * FROM trials WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute("UPDATE trials SET status = 'running', updated = ? WHERE id = ?",
+                             (time.time(), row['id']))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {'id': row['id'], 'config': json.loads(row['config']), 'epochs_done': row['epochs_done']}
+
+    def record_epoch(self, trial_id, epoch, val_auc, val_loss, seconds):
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO epochs VALUES (?, ?, ?, ?, ?)',
+                         (trial_id, epoch, val_auc, val_loss, seconds))
+            conn.execute('UPDATE trials SET epochs_done = ?, final_metric = ?, updated = ? WHERE id = ?',
+                         (epoch, val_auc, time.time(), trial_id))
+
+    def report_rung(self, trial_id, rung, metric, eta=ETA):
+        """
+        Catat metrik trial di rung ini. Return True jika trial masuk 1/eta
+        teratas dari semua trial yang sudah mencapai rung ini (lanjut)
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO rungs VALUES (?, ?, ?)', (trial_id, rung, metric))
+            metrics = sorted((r[0] for r in conn.execute('SELECT metric FROM rungs WHERE rung = ?', (rung,))),
+                             reverse=True)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        keep = max(1, len(metrics) // eta)
+        return metric >= metrics[keep - 1]
+
+    def finish(self, trial_id, status):
+        with self._connect() as conn:
+            conn.execute('UPDATE trials SET status = ?, updated = ? WHERE id = ?',
+                         (status, time.time(), trial_id))
+
+    def trials(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT * FROM trials ORDER BY final_metric DESC').fetchall()
+        return [dict(row, config=json.loads(row['config'])) for row in rows]
+
+    def best(self):
+        completed = [t for t in self.trials() if t['status'] == 'completed']
+        return completed[0] if completed else None
+
+
+def trial_weights_path(search_dir, trial_id):
+    return os.path.join(search_dir, f'trial_{trial_id}.weights.h5')
+
+
+def build_trial_model(config):
+    return create_model(img_size=IMG_SIZE, dropout=(config['dropout1'], config['dropout2']))
+
+
+def compile_for_phase(model, config, fine_tune):
+    # Sama dengan dua fase train_model(): head dengan backbone frozen, lalu
+    # fine-tune unfreeze_layers layer teratas backbone
+    base_model = model.layers[0]
+    base_model.trainable = fine_tune
+    if fine_tune:
+        for layer in base_model.layers[:-config['unfreeze_layers']]:
+            layer.trainable = False
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(
+            learning_rate=config['fine_tune_lr'] if fine_tune else config['learning_rate']),
+        loss='binary_crossentropy',
+        metrics=[tf.keras.metrics.AUC(name='auc')]
+    )
+
+
+def run_trial(store, trial, search_dir, rungs, eta, max_epochs):
+    config = trial['config']
+    train_gen, val_gen = prepare_data(IMG_SIZE, config['batch_size'])
+    model = build_trial_model(config)
+    weights_path = trial_weights_path(search_dir, trial['id'])
+    start_epoch = trial['epochs_done']
+    if start_epoch and os.path.exists(weights_path):
+        model.load_weights(weights_path)
+    else:
+        start_epoch = 0
+
+    fine_tune = start_epoch >= config['head_epochs']
+    compile_for_phase(model, config, fine_tune)
+    for epoch in range(start_epoch, max_epochs):
+        if not fine_tune and epoch >= config['head_epochs']:
+            fine_tune = True
+            compile_for_phase(model, config, fine_tune)
+        start = time.time()
+        history = model.fit(train_gen, validation_data=val_gen, epochs=epoch + 1,
+                            initial_epoch=epoch, verbose=0)
+        val_auc = float(history.history['val_auc'][-1])
+        val_loss = float(history.history['val_loss'][-1])
+        model.save_weights(weights_path)
+        store.record_epoch(trial['id'], epoch + 1, val_auc, val_loss, time.time() - start)
+        print(f"[trial {trial['id']}] epoch {epoch + 1}/{max_epochs} val_auc={val_auc:.4f}")
+
+        if epoch + 1 in rungs and not store.report_rung(trial['id'], epoch + 1, val_auc, eta):
+            print(f"[trial {trial['id']}] dihentikan di rung {epoch + 1}")
+            return 'stopped'
+    return 'completed'
+
+
+def _search_worker(db_path, search_dir, threads, rungs, eta, max_epochs):
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+    store = TrialStore(db_path)
+    while True:
+        trial = store.claim()
+        if trial is None:
+            break
+        try:
+            status = run_trial(store, trial, search_dir, rungs, eta, max_epochs)
+        except Exception as e:
+            print(f"[trial {trial['id']}] gagal: {e}")
+            status = 'failed'
+        store.finish(trial['id'], status)
+        tf.keras.backend.clear_session()
+
+
+def print_summary(store, limit=10):
+    trials = store.trials()
+    counts = {}
+    for t in trials:
+        counts[t['status']] = counts.get(t['status'], 0) + 1
+    print(f"\n{'='*100}")
+    print(f"{'trial':>6}{'status':>11}{'epoch':>7}{'val_auc':>9}  config")
+    print(f"{'='*100}")
+    for t in trials[:limit]:
+        config = ' '.join(f"{k}={v:.2g}" if isinstance(v, float) else f"{k}={v}"
+                          for k, v in t['config'].items())
+        metric = f"{t['final_metric']:.4f}" if t['final_metric'] is not None else '-'
+        print(f"{t['id']:>6}{t['status']:>11}{t['epochs_done']:>7}{metric:>9}  {config}")
+    print(f"{'='*100}")
+    print(' '.join(f"{k}: {v}" for k, v in sorted(counts.items())))
+
+
+def run_search(num_trials=24, workers=2, max_epochs=MAX_EPOCHS, min_epochs=MIN_EPOCHS, eta=ETA,
+               search_dir=SEARCH_DIR, seed=0):
+    """
+    Jalankan (atau lanjutkan) pencarian sampai num_trials trial selesai.
+    Trial baru di-sample hanya jika store belum punya num_trials trial
+    """
+    os.makedirs(search_dir, exist_ok=True)
+    db_path = os.path.join(search_dir, 'search.db')
+    store = TrialStore(db_path)
+    resumed = store.reset_running()
+    existing = store.count()
+    if existing < num_trials:
+        rng = random.Random(seed + existing)
+        store.add_trials([sample_config(rng) for _ in range(num_trials - existing)])
+    rungs = rungs_for(min_epochs, max_epochs, eta)
+    print(f"🔍 {num_trials} trial, {workers} worker, rung {rungs} (eta={eta}), "
+          f"{existing} trial dari run sebelumnya ({resumed} dilanjutkan)")
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    ctx = multiprocessing.get_context('spawn')
+    processes = [ctx.Process(target=_search_worker,
+                             args=(db_path, search_dir, threads, rungs, eta, max_epochs))
+                 for _ in range(workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    print_summary(store)
+    return store.best()
+
+
+def export_best(search_dir=SEARCH_DIR, output_path='oral_cancer_model.tflite'):
+    """Bangun ulang model trial terbaik dan ekspor lewat convert_to_tflite()"""
+    store = TrialStore(os.path.join(search_dir, 'search.db'))
+    best = store.best()
+    if best is None:
+        raise SystemExit(f"Belum ada trial yang selesai di {search_dir}")
+    model = build_trial_model(best['config'])
+    model.load_weights(trial_weights_path(search_dir, best['id']))
+    print(f"🏆 Trial {best['id']} (val_auc={best['final_metric']:.4f}): {best['config']}")
+    with open(os.path.splitext(output_path)[0] + '_config.json', 'w') as f:
+        json.dump({'trial': best['id'], 'val_auc': best['final_metric'], **best['config']}, f, indent=2)
+    convert_to_tflite(model, uint8_input=True, embedding_output=True, heatmap_output=True,
+                      output_path=output_path)
+    return best
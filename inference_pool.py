@@ -0,0 +1,392 @@
+"""
+Proses inference terpisah yang diberi tensor lewat shared memory
+
+Worker HTTP (front-end) hanya decode + resize lalu menulis piksel RGB uint8
+IMG_SIZE x IMG_SIZE ke satu slot di shared memory. Sejumlah proses
+inference, masing-masing dengan satu interpreter, mengambil slot
+berikutnya, menjalankan invoke, dan menulis skor kembali ke slot yang sama.
+Tensor tidak pernah di-pickle atau disalin antar proses.
+
+Pool harus dibuat sebelum gunicorn fork worker supaya semua front-end
+memakai pool yang sama:
+    INFERENCE_WORKERS=2 gunicorn app:app --preload --workers 4 --threads 4
+Tanpa --preload setiap worker gunicorn membuat pool sendiri.
+
+Prioritas berlaku global untuk semua front-end: tiap slot mencatat lane
+dan nomor antrian, dan proses inference memilih slot berikutnya dengan
+stride scheduling antar lane (sama dengan scheduler.py). Lane selain lane
+pertama tidak boleh memakai `reserved` slot terakhir, jadi request
+interaktif selalu bisa masuk meski bulk memenuhi pool.
+
+Status slot (array di shared memory, diubah di bawah satu lock):
+    FREE -> CLAIMED (front-end menulis tensor) -> QUEUED -> RUNNING (proses
+    inference) -> DONE/ERROR -> FREE (front-end membaca skor). Jika
+    front-end timeout saat RUNNING, slot ditandai ABANDONED dan proses
+    inference yang mengembalikannya.
+
+Thread monitor di proses pemilik pool me-respawn proses inference yang mati
+dan mengembalikan slot yang ditinggal proses mati (inference atau front-end).
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import types
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from scheduler import QueueFull
+
+FREE, CLAIMED, QUEUED, RUNNING, DONE, ERROR, ABANDONED = range(7)
+# Index di array counters shared memory
+NEXT_TICKET, RESPAWNED, REAPED = range(3)
+
+
+class PoolBusy(QueueFull):
+    pass
+
+
+def _pid_alive(pid):
+    # Process.is_alive() hanya boleh dipanggil parent; worker gunicorn bukan parent
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def _fields(slots, workers, num_lanes, img_size):
+    return [
+        ('lane_pass', np.float64, (num_lanes,)),
+        ('virtual_time', np.float64, (1,)),
+        ('tickets', np.int64, (slots,)),
+        ('counters', np.int64, (3,)),
+        ('scores', np.float32, (slots,)),
+        ('front_pids', np.int32, (slots,)),
+        ('runner_pids', np.int32, (slots,)),
+        ('worker_pids', np.int32, (workers,)),
+        ('states', np.int8, (slots,)),
+        ('lanes', np.int8, (slots,)),
+        ('worker_alive', np.int8, (workers,)),
+        ('tensors', np.uint8, (slots, img_size, img_size, 3)),
+    ]
+
+
+def _align(offset):
+    return (offset + 7) // 8 * 8
+
+
+def _shm_size(*dims):
+    size = 0
+    for _, dtype, shape in _fields(*dims):
+        size = _align(size) + int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return size
+
+
+def _layout(buf, *dims):
+    """View numpy di atas satu blok shared memory (dims: slots, workers, num_lanes, img_size)"""
+    views, offset = {}, 0
+    for name, dtype, shape in _fields(*dims):
+        offset = _align(offset)
+        views[name] = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+        offset += views[name].nbytes
+    return types.SimpleNamespace(**views)
+
+
+def _enqueue(s, slot, lane):
+    """CLAIMED -> QUEUED. Dipanggil dengan lock dipegang"""
+    queued = s.states == QUEUED
+    if not np.any(queued & (s.lanes == lane)):
+        # Lane yang baru aktif kembali tidak boleh "menabung" giliran
+        active = s.lane_pass[np.unique(s.lanes[queued])]
+        s.lane_pass[lane] = max(s.lane_pass[lane], active.min() if active.size else s.virtual_time[0])
+    s.lanes[slot] = lane
+    s.tickets[slot] = s.counters[NEXT_TICKET]
+    s.counters[NEXT_TICKET] += 1
+    s.states[slot] = QUEUED
+
+
+def _dispatch(s, shares):
+    """Slot QUEUED berikutnya (stride antar lane, FIFO dalam lane) atau None. Dengan lock"""
+    queued = np.flatnonzero(s.states == QUEUED)
+    if not queued.size:
+        return None
+    waiting = np.unique(s.lanes[queued])
+    lane = waiting[np.argmin(s.lane_pass[waiting])]
+    in_lane = queued[s.lanes[queued] == lane]
+    slot = int(in_lane[np.argmin(s.tickets[in_lane])])
+    s.virtual_time[0] = s.lane_pass[lane]
+    s.lane_pass[lane] += 1.0 / shares[lane]
+    return slot
+
+
+def tflite_runner(model_path, num_threads):
+    """Return (nama dtype input, score(batch uint8) -> prob model)"""
+    import tensorflow as tf
+
+    interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()
+    prob_output = next(d for d in interpreter.get_output_details() if d['shape'][-1] == 1)
+    uint8_input = input_details[0]['dtype'] == np.uint8
+
+    def score(batch):
+        if not uint8_input:
+            batch = batch.astype(np.float32) / 255.0
+        interpreter.set_tensor(input_details[0]['index'], batch)
+        interpreter.invoke()
+        return float(interpreter.get_tensor(prob_output['index'])[0][0])
+
+    return np.dtype(input_details[0]['dtype']).name, score
+
+
+def _inference_worker(runner, model_path, num_threads, shm_name, dims, shares,
+                      queued, done, lock, stop, ready):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    s = _layout(shm.buf, *dims)
+    dtype_name, score_batch = runner(model_path, num_threads)
+    ready.put(dtype_name)
+    pid = os.getpid()
+
+    while not stop.is_set():
+        # Dengan timeout: token yang hilang (proses mati setelah acquire)
+        # tidak membuat slot QUEUED menggantung
+        queued.acquire(timeout=0.5)
+        with lock:
+            slot = _dispatch(s, shares)
+            if slot is None:
+                continue
+            s.states[slot] = RUNNING
+            s.runner_pids[slot] = pid
+        try:
+            score, state = score_batch(s.tensors[slot:slot + 1]), DONE
+        except Exception as e:
+            print(f"Inference worker {pid} error: {e}")
+            score, state = 0.0, ERROR
+        with lock:
+            if s.states[slot] == ABANDONED:
+                s.states[slot] = FREE
+            elif s.states[slot] == RUNNING:
+                s.scores[slot] = score
+                s.states[slot] = state
+                done[slot].release()
+
+    del s
+    shm.close()
+
+
+class InferencePool:
+    def __init__(self, model_path, workers=2, slots=None, img_size=224, timeout=30.0, num_threads=1,
+                 lanes=None, reserved=None, runner=tflite_runner, monitor_interval=1.0):
+        """
+        lanes: {nama: share} berurutan, lane pertama boleh memakai slot cadangan.
+        runner(model_path, num_threads) dijalankan di proses inference
+        """
+        self.model_path = model_path
+        self.workers = workers
+        self.slots = slots or 4 * workers
+        self.img_size = img_size
+        self.timeout = timeout
+        self.num_threads = num_threads
+        self.lane_names = list(lanes or {'interactive': 1.0})
+        self.shares = [float(share) for share in (lanes or {'interactive': 1.0}).values()]
+        if min(self.shares) <= 0:
+            raise ValueError(f"Lane share harus > 0 (dapat {self.shares})")
+        self.reserved = min(workers, self.slots - 1) if reserved is None else reserved
+        self.runner = runner
+        self.monitor_interval = monitor_interval
+        self.input_dtype = None
+        self.processes = []
+        self.counters = {'scored': 0, 'busy': 0, 'timeouts': 0, 'errors': 0}
+        self._counter_lock = threading.Lock()
+        self._stopping = False
+
+        # Objek sinkronisasi dibuat dengan context spawn (TF tidak fork-safe
+        # untuk proses inference), tapi tetap diwarisi worker gunicorn lewat fork
+        self._ctx = multiprocessing.get_context('spawn')
+        self._dims = (self.slots, workers, len(self.shares), img_size)
+        self._shm = shared_memory.SharedMemory(create=True, size=_shm_size(*self._dims))
+        self._s = _layout(self._shm.buf, *self._dims)
+        self._s.states[:] = FREE
+        self._queued = self._ctx.Semaphore(0)
+        self._done = [self._ctx.Semaphore(0) for _ in range(self.slots)]
+        self._lock = self._ctx.Lock()
+        self._stop = self._ctx.Event()
+        self._ready = self._ctx.Queue()
+        self._owner_pid = os.getpid()
+
+    def _spawn(self):
+        p = self._ctx.Process(
+            target=_inference_worker, daemon=True,
+            args=(self.runner, self.model_path, self.num_threads, self._shm.name, self._dims, self.shares,
+                  self._queued, self._done, self._lock, self._stop, self._ready))
+        p.start()
+        return p
+
+    def start(self, ready_timeout=120):
+        self.processes = [self._spawn() for _ in range(self.workers)]
+        try:
+            dtypes = {self._ready.get(timeout=ready_timeout) for _ in self.processes}
+        except queue.Empty:
+            self.close()
+            raise RuntimeError("Inference workers did not start in time")
+        self.input_dtype = np.dtype(dtypes.pop())
+        self._s.worker_pids[:] = [p.pid for p in self.processes]
+        self._s.worker_alive[:] = 1
+        threading.Thread(target=self._monitor, daemon=True).start()
+        atexit.register(self.close)
+        return self
+
+    def _monitor(self):
+        while not self._stopping:
+            time.sleep(self.monitor_interval)
+            if not self._stopping:
+                self.check()
+
+    def check(self):
+        """Respawn proses inference yang mati, kembalikan slot milik proses mati (hanya pemilik)"""
+        s = self._s
+        if s is None:
+            return
+        alive = set()
+        for i, p in enumerate(self.processes):
+            # is_alive() juga me-reap zombie; os.kill(pid, 0) masih sukses untuk zombie
+            if not p.is_alive():
+                print(f"Inference worker {p.pid} died (exit code {p.exitcode}), respawning")
+                p = self.processes[i] = self._spawn()
+                s.worker_pids[i] = p.pid
+                s.counters[RESPAWNED] += 1
+            alive.add(p.pid)
+        s.worker_alive[:] = [p.is_alive() for p in self.processes]
+        while True:
+            try:
+                self._ready.get_nowait()
+            except queue.Empty:
+                break
+
+        with self._lock:
+            for slot in np.flatnonzero(s.states != FREE):
+                state = s.states[slot]
+                if state in (RUNNING, ABANDONED) and s.runner_pids[slot] not in alive:
+                    # Proses inference mati di tengah invoke
+                    if state == RUNNING:
+                        s.states[slot] = ERROR
+                        self._done[slot].release()
+                    else:
+                        s.states[slot] = FREE
+                elif state != ABANDONED and not _pid_alive(s.front_pids[slot]):
+                    # Front-end mati (mis. di-recycle memory budget) sebelum membaca hasil;
+                    # slot yang masih di-invoke dikembalikan proses inference
+                    if state == RUNNING:
+                        s.states[slot] = ABANDONED
+                    else:
+                        if state in (DONE, ERROR):
+                            self._done[slot].acquire(False)
+                        s.states[slot] = FREE
+                else:
+                    continue
+                s.counters[REAPED] += 1
+
+    def _claim_slot(self, lane):
+        s = self._s
+        # Lane selain lane pertama harus menyisakan slot cadangan
+        keep = 0 if lane == 0 else self.reserved
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                free = np.flatnonzero(s.states == FREE)
+                if free.size > keep:
+                    slot = int(free[0])
+                    s.states[slot] = CLAIMED
+                    s.front_pids[slot] = os.getpid()
+                    return slot
+            # Polling, bukan Condition antar proses: notify ke proses yang
+            # sudah mati (worker gunicorn di-kill) bisa menggantung selamanya
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.001)
+
+    def _count(self, name):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def score(self, img, lane=None):
+        """
+        img: PIL RGB atau array uint8 (img_size, img_size, 3).
+        Return output probabilitas model (prob non-kanker)
+        """
+        s = self._s
+        lane_index = self.lane_names.index(lane) if lane else 0
+        slot = self._claim_slot(lane_index)
+        if slot is None:
+            self._count('busy')
+            raise PoolBusy(lane or self.lane_names[0])
+        # Ditulis langsung ke slot; proses inference membaca dari slot yang sama
+        s.tensors[slot] = np.asarray(img, dtype=np.uint8)
+        with self._lock:
+            _enqueue(s, slot, lane_index)
+        self._queued.release()
+
+        if not self._done[slot].acquire(timeout=self.timeout):
+            with self._lock:
+                state = s.states[slot]
+                if state == QUEUED:
+                    s.states[slot] = FREE
+                elif state == RUNNING:
+                    s.states[slot] = ABANDONED
+            if state in (QUEUED, RUNNING):
+                self._count('timeouts')
+                raise TimeoutError(f"Inference slot {slot} timed out after {self.timeout:g}s")
+            # Selesai tepat saat timeout; semaphore sudah dilepas
+            self._done[slot].acquire()
+
+        with self._lock:
+            score, state = float(s.scores[slot]), s.states[slot]
+            s.states[slot] = FREE
+        if state == ERROR:
+            self._count('errors')
+            raise RuntimeError(f"Inference failed in slot {slot}")
+        self._count('scored')
+        return score
+
+    def stats(self):
+        s = self._s
+        with self._counter_lock:
+            counters = dict(self.counters)
+        states, lanes = s.states.copy(), s.lanes.copy()
+        return {
+            'workers': self.workers,
+            'alive': int(s.worker_alive.sum()),
+            'respawned': int(s.counters[RESPAWNED]),
+            'reaped': int(s.counters[REAPED]),
+            'slots': self.slots,
+            'reserved': self.reserved,
+            'slots_in_use': int(np.sum(states != FREE)),
+            'slots_abandoned': int(np.sum(states == ABANDONED)),
+            'queued': {name: int(np.sum((states == QUEUED) & (lanes == i)))
+                       for i, name in enumerate(self.lane_names)},
+            # Counter per front-end (worker gunicorn ini saja)
+            **counters,
+        }
+
+    def close(self):
+        # Worker gunicorn mewarisi objek ini lewat fork; hanya pemilik yang
+        # menghentikan proses inference dan menghapus shared memory
+        if os.getpid() != self._owner_pid or self._shm is None:
+            return
+        self._stopping = True
+        self._stop.set()
+        for _ in self.processes:
+            self._queued.release()
+        for p in self.processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self._s = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
@@ -0,0 +1,436 @@
+"""
+Load test untuk seluruh stack /predict (gunicorn app:app) di server lokal
+
+Contoh:
+    python load_test.py --workers 2 --threads 4 --concurrency 8 --duration 30
+    python load_test.py --rate 20 --duration 60 --images path/to/samples
+    python load_test.py --compare loadtest_results/20260101-120000.json
+    python load_test.py --threads 4 --concurrency 16 --bulk-fraction 0.7
+    python load_test.py --workers 4 --threads 4 --inference-workers 2 --concurrency 16
+
+Jika oral_cancer_model.tflite tidak ada, model pengganti kecil dibuat
+otomatis supaya angka HTTP/decode/resize tetap realistis.
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+RESULTS_DIR = 'loadtest_results'
+STANDIN_MODEL_PATH = os.path.join(RESULTS_DIR, 'standin_model.tflite')
+
+# Campuran payload default: (lebar, tinggi, format, quality, bobot)
+# 512px JPEG 0.7 = output compressImage() di index.html
+DEFAULT_MIX = [
+    (512, 384, 'JPEG', 70, 6),
+    (512, 683, 'JPEG', 70, 2),
+    (1024, 768, 'JPEG', 85, 1),
+    (640, 480, 'PNG', None, 1),
+]
+
+
+def build_standin_model(path, img_size=224):
+    """
+    Model TFLite kecil dengan input/output yang sama dengan model asli
+    """
+    import tensorflow as tf
+    from tensorflow.keras import layers, models
+
+    model = models.Sequential([
+        layers.Input(shape=(img_size, img_size, 3), dtype='uint8'),
+        layers.Rescaling(1./255),
+        layers.Conv2D(8, 3, strides=4, activation='relu'),
+        layers.GlobalAveragePooling2D(),
+        layers.Dense(1, activation='sigmoid'),
+    ])
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(converter.convert())
+    print(f"✓ Stand-in model dibuat: {path}")
+    return path
+
+
+def encode_image(img, fmt, quality):
+    buf = io.BytesIO()
+    if quality is not None:
+        img.save(buf, format=fmt, quality=quality)
+    else:
+        img.save(buf, format=fmt)
+    mime = 'image/jpeg' if fmt == 'JPEG' else f'image/{fmt.lower()}'
+    return f"data:{mime};base64," + base64.b64encode(buf.getvalue()).decode('ascii')
+
+
+def synthetic_payloads(seed=0):
+    """
+    Gambar sintetis dengan tekstur (bukan warna polos) supaya ukuran JPEG
+    mendekati foto asli
+    """
+    rng = np.random.default_rng(seed)
+    payloads, weights = [], []
+    for width, height, fmt, quality, weight in DEFAULT_MIX:
+        yy, xx = np.mgrid[0:height, 0:width]
+        base = np.stack([
+            128 + 60 * np.sin(xx / 23.0),
+            90 + 50 * np.cos(yy / 17.0),
+            110 + 40 * np.sin((xx + yy) / 31.0),
+        ], axis=-1)
+        noise = rng.normal(0, 18, size=base.shape)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        payloads.append(encode_image(Image.fromarray(pixels), fmt, quality))
+        weights.append(weight)
+    return payloads, weights
+
+
+def directory_payloads(directory):
+    payloads = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+            continue
+        with open(os.path.join(directory, filename), 'rb') as f:
+            raw = f.read()
+        mime = 'image/png' if filename.lower().endswith('.png') else 'image/jpeg'
+        payloads.append(f"data:{mime};base64," + base64.b64encode(raw).decode('ascii'))
+    if not payloads:
+        raise SystemExit(f"Tidak ada gambar .jpg/.png di {directory}")
+    return payloads, [1] * len(payloads)
+
+
+class ProcessSampler(threading.Thread):
+    """
+    Sampling RSS dan CPU untuk proses gunicorn beserta worker-nya (via /proc)
+    """
+
+    def __init__(self, root_pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+        self._ticks = os.sysconf('SC_CLK_TCK')
+        self._page = os.sysconf('SC_PAGE_SIZE')
+
+    def _tree(self):
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                children.setdefault(int(fields[1]), []).append(int(entry))
+            except (OSError, IndexError):
+                continue
+        pids, stack = [], [self.root_pid]
+        while stack:
+            pid = stack.pop()
+            pids.append(pid)
+            stack.extend(children.get(pid, []))
+        return pids
+
+    def _read(self):
+        rss, cpu_ticks = 0, 0
+        for pid in self._tree():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+                cpu_ticks += int(fields[11]) + int(fields[12])
+                with open(f'/proc/{pid}/statm') as f:
+                    rss += int(f.read().split()[1]) * self._page
+            except (OSError, IndexError):
+                continue
+        return rss, cpu_ticks / self._ticks
+
+    def run(self):
+        last_t, (_, last_cpu) = time.monotonic(), self._read()
+        while not self._done.wait(self.interval):
+            now = time.monotonic()
+            rss, cpu = self._read()
+            self.samples.append((rss, 100.0 * (cpu - last_cpu) / (now - last_t)))
+            last_t, last_cpu = now, cpu
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        if not self.samples:
+            return {}
+        rss = np.array([s[0] for s in self.samples]) / (1024 * 1024)
+        cpu = np.array([s[1] for s in self.samples])
+        return {
+            'rss_mb_peak': float(rss.max()),
+            'rss_mb_mean': float(rss.mean()),
+            'cpu_percent_mean': float(cpu.mean()),
+            'cpu_percent_peak': float(cpu.max()),
+        }
+
+
+def start_server(args, model_path):
+    timeout = 120
+    env = dict(os.environ, MODEL_PATH=model_path, WORKER_TIMEOUT=str(timeout))
+    cmd = [
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '--bind', f'127.0.0.1:{args.port}',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        '--timeout', str(timeout),
+    ]
+    if args.inference_workers:
+        # Pool dibuat di master sebelum fork, dipakai bersama semua worker
+        env['INFERENCE_WORKERS'] = str(args.inference_workers)
+        cmd.append('--preload')
+    print(f"🚀 {' '.join(cmd[2:])}")
+    proc = subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+    url = f'http://127.0.0.1:{args.port}/health'
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("gunicorn berhenti sebelum siap")
+        try:
+            with urllib.request.urlopen(url, timeout=2) as resp:
+                if json.load(resp).get('model_loaded'):
+                    return proc
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.5)
+    stop_server(proc)
+    raise SystemExit("Server tidak siap dalam batas waktu")
+
+
+def stop_server(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def send(url, body, timeout, bulk=False):
+    headers = {'Content-Type': 'application/json'}
+    if bulk:
+        headers['X-Priority'] = 'bulk'
+    req = urllib.request.Request(url, data=body, headers=headers)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            ok = resp.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        ok = False
+    return start, time.perf_counter(), ok
+
+
+def run_closed_loop(url, bodies, weights, args):
+    """
+    Konkurensi tetap: N klien, masing-masing kirim request berikutnya
+    segera setelah respons sebelumnya diterima
+    """
+    rng = np.random.default_rng(args.seed)
+    p = np.asarray(weights, dtype=float) / sum(weights)
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client(seed):
+        local_rng = np.random.default_rng(seed)
+        local = []
+        while time.perf_counter() < deadline:
+            body = bodies[local_rng.choice(len(bodies), p=p)]
+            bulk = local_rng.random() < args.bulk_fraction
+            start, end, ok = send(url, body, args.timeout, bulk)
+            local.append((end - start, ok, 'bulk' if bulk else 'interactive'))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=client, args=(int(s),))
+               for s in rng.integers(0, 2**31, size=args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def run_open_loop(url, bodies, weights, args):
+    """
+    Laju kedatangan tetap: request dijadwalkan setiap 1/rate detik.
+    Latensi dihitung dari waktu jadwal (bukan waktu kirim) supaya antrian
+    di sisi klien ikut terukur
+    """
+    rng = np.random.default_rng(args.seed)
+    total = int(args.rate * args.duration)
+    picks = rng.choice(len(bodies), size=total, p=np.asarray(weights, dtype=float) / sum(weights))
+    bulk = rng.random(total) < args.bulk_fraction
+    t0 = time.perf_counter() + 0.1
+
+    def fire(i):
+        scheduled = t0 + i / args.rate
+        _, end, ok = send(url, bodies[picks[i]], args.timeout, bulk[i])
+        return end - scheduled, ok, 'bulk' if bulk[i] else 'interactive'
+
+    with ThreadPoolExecutor(max_workers=args.max_inflight) as pool:
+        futures = []
+        for i in range(total):
+            delay = t0 + i / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(fire, i))
+        return [f.result() for f in futures]
+
+
+def summarize(results, elapsed, per_lane=True):
+    latencies = np.array([r[0] for r in results if r[1]]) * 1000
+    errors = sum(1 for r in results if not r[1])
+    summary = {
+        'requests': len(results),
+        'errors': errors,
+        'error_rate': errors / len(results) if results else 0.0,
+        'throughput_rps': (len(results) - errors) / elapsed if elapsed else 0.0,
+    }
+    if latencies.size:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+        summary.update({
+            'latency_ms_p50': float(p50),
+            'latency_ms_p90': float(p90),
+            'latency_ms_p99': float(p99),
+            'latency_ms_max': float(latencies.max()),
+        })
+    lanes = sorted({r[2] for r in results})
+    if per_lane and len(lanes) > 1:
+        # Metrik per jalur prioritas (lihat scheduler.py), untuk memastikan
+        # SLO interaktif tetap terjaga di bawah beban campuran
+        summary['lanes'] = {lane: summarize([r for r in results if r[2] == lane], elapsed, False)
+                            for lane in lanes}
+    return summary
+
+
+def print_summary(result, baseline=None):
+    print("\n" + "="*60)
+    print(f"📊 workers={result['config']['workers']} threads={result['config']['threads']} "
+          f"inference_workers={result['config'].get('inference_workers', 0)} "
+          f"mode={result['config']['mode']}")
+    print("="*60)
+    keys = ['throughput_rps', 'latency_ms_p50', 'latency_ms_p90', 'latency_ms_p99',
+            'error_rate', 'rss_mb_peak', 'cpu_percent_mean']
+    for key in keys:
+        if key not in result['summary']:
+            continue
+        value = result['summary'][key]
+        line = f"{key:<20} {value:>10.2f}"
+        if baseline and key in baseline['summary']:
+            old = baseline['summary'][key]
+            if old:
+                line += f"   ({(value - old) / old * 100:+.1f}% vs baseline)"
+        print(line)
+    for lane, lane_summary in result['summary'].get('lanes', {}).items():
+        print(f"  {lane:<12} rps={lane_summary['throughput_rps']:.2f} "
+              f"p50={lane_summary.get('latency_ms_p50', 0):.1f}ms "
+              f"p99={lane_summary.get('latency_ms_p99', 0):.1f}ms "
+              f"err={lane_summary['error_rate'] * 100:.1f}%")
+    print("="*60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--inference-workers', type=int, default=0,
+                        help='proses inference terpisah (INFERENCE_WORKERS), 0 = interpreter per worker')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--concurrency', type=int, default=4, help='jumlah klien (mode closed-loop)')
+    parser.add_argument('--rate', type=float, help='request/detik (mode open-loop)')
+    parser.add_argument('--max-inflight', type=int, default=256, help='batas request bersamaan (open-loop)')
+    parser.add_argument('--duration', type=float, default=30, help='detik')
+    parser.add_argument('--bulk-fraction', type=float, default=0.0,
+                        help='porsi request yang dikirim dengan X-Priority: bulk')
+    parser.add_argument('--warmup', type=int, default=5, help='request pemanasan sebelum diukur')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--startup-timeout', type=float, default=120, help='detik menunggu /health')
+    parser.add_argument('--images', help='folder gambar asli (default: gambar sintetis)')
+    parser.add_argument('--model', help='path .tflite (default: MODEL_PATH atau stand-in)')
+    parser.add_argument('--url', help='uji server yang sudah berjalan, tanpa menjalankan gunicorn')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help=f'file hasil (default: {RESULTS_DIR}/<timestamp>.json)')
+    parser.add_argument('--compare', help='file hasil sebelumnya untuk dibandingkan')
+    args = parser.parse_args()
+
+    payloads, weights = directory_payloads(args.images) if args.images else synthetic_payloads(args.seed)
+    bodies = [json.dumps({'image': p}).encode() for p in payloads]
+    print(f"📦 {len(bodies)} payload, rata-rata {np.mean([len(b) for b in bodies]) / 1024:.1f} KB")
+
+    proc, sampler = None, None
+    model_path = args.model or os.environ.get('MODEL_PATH', 'oral_cancer_model.tflite')
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        if not os.path.exists(model_path):
+            print(f"⚠️  {model_path} tidak ditemukan, memakai stand-in model")
+            model_path = build_standin_model(STANDIN_MODEL_PATH)
+        proc = start_server(args, os.path.abspath(model_path))
+        base_url = f'http://127.0.0.1:{args.port}'
+    url = base_url + '/predict'
+
+    try:
+        for i in range(args.warmup):
+            send(url, bodies[i % len(bodies)], args.timeout)
+
+        if proc is not None:
+            sampler = ProcessSampler(proc.pid)
+            sampler.start()
+
+        start = time.perf_counter()
+        if args.rate:
+            results = run_open_loop(url, bodies, weights, args)
+        else:
+            results = run_closed_loop(url, bodies, weights, args)
+        elapsed = time.perf_counter() - start
+
+        summary = summarize(results, elapsed)
+        if sampler is not None:
+            summary.update(sampler.stop())
+    finally:
+        if proc is not None:
+            stop_server(proc)
+
+    result = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'workers': args.workers,
+            'threads': args.threads,
+            'inference_workers': args.inference_workers,
+            'mode': f'rate={args.rate}/s' if args.rate else f'concurrency={args.concurrency}',
+            'bulk_fraction': args.bulk_fraction,
+            'duration': args.duration,
+            'model': model_path if not args.url else args.url,
+            'payloads': args.images or 'synthetic',
+        },
+        'summary': summary,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_summary(result, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"✓ Hasil disimpan: {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Pencatatan memori per worker gunicorn dan recycle otomatis
+
+RSS dibaca dari /proc/self/statm (Linux), peak dari getrusage. Jika RSS
+melewati budget, worker mengirim SIGTERM ke dirinya sendiri satu kali:
+gunicorn menyelesaikan request yang sedang berjalan, lalu arbiter
+menjalankan worker pengganti.
+"""
+
+import collections
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+
+
+def current_rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss dalam KB di Linux, byte di macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class WorkerMemory:
+    def __init__(self, budget_mb=None, recent_images=100):
+        self.budget_bytes = budget_mb * 1024 * 1024 if budget_mb else None
+        self.recent_images = collections.deque(maxlen=recent_images)
+        self.recycling = False
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record_image(self, size):
+        with self._lock:
+            self.recent_images.append(size)
+
+    def check_budget(self, under_gunicorn):
+        """
+        Panggil setelah request selesai. Return True jika recycle dimulai
+        """
+        if self.budget_bytes is None or self.recycling or not under_gunicorn:
+            return False
+        rss = current_rss_bytes()
+        if rss <= self.budget_bytes:
+            return False
+        with self._lock:
+            if self.recycling:
+                return False
+            self.recycling = True
+        print(f"Worker {os.getpid()} RSS {rss / (1024 * 1024):.0f} MB over budget "
+              f"{self.budget_bytes / (1024 * 1024):.0f} MB, recycling after in-flight requests")
+        os.kill(os.getpid(), signal.SIGTERM)
+        return True
+
+    def stats(self):
+        with self._lock:
+            images = list(self.recent_images)
+        largest = max(images, key=lambda s: s[0] * s[1]) if images else None
+        return {
+            'pid': os.getpid(),
+            'uptime_seconds': round(time.time() - self.started),
+            'rss_mb': round(current_rss_bytes() / (1024 * 1024), 1),
+            'peak_rss_mb': round(peak_rss_bytes() / (1024 * 1024), 1),
+            'budget_mb': round(self.budget_bytes / (1024 * 1024)) if self.budget_bytes else None,
+            'recycling': self.recycling,
+            'largest_recent_image': {
+                'size': list(largest),
+                'megapixels': round(largest[0] * largest[1] / 1e6, 2),
+            } if largest else None,
+        }
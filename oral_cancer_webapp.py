@@ -98,13 +98,14 @@ def load_model():
 # =====================================
 # 🔍 PREPROCESSING FUNCTION
 # =====================================
-def preprocess_image(image, target_size=(224, 224)):
+def preprocess_image(image, target_size=(224, 224), dtype=np.float32):
     """
     Preprocess image for model prediction
     
     Args:
         image: PIL Image
         target_size: tuple (height, width)
+        dtype: model input dtype (uint8 models rescale inside the graph)
     
     Returns:
         Preprocessed numpy array
@@ -117,10 +118,11 @@ def preprocess_image(image, target_size=(224, 224)):
     image = image.resize(target_size)
     
     # Convert to numpy array
-    img_array = np.array(image)
+    img_array = np.asarray(image)
     
-    # Normalize to [0, 1]
-    img_array = img_array.astype('float32') / 255.0
+    # Normalize to [0, 1] (skipped when the model takes raw uint8 pixels)
+    if dtype != np.uint8:
+        img_array = img_array.astype('float32') / 255.0
     
     # Add batch dimension
     img_array = np.expand_dims(img_array, axis=0)
@@ -152,7 +154,10 @@ def predict(interpreter, image):
     interpreter.invoke()
     
     # Get output tensor
-    output = interpreter.get_tensor(output_details[0]['index'])
+    # Model ekspor train_model.py juga punya output embedding / feature map dan
+    # urutan output TFLite tidak dijamin, jadi pilih output probabilitas (shape [1, 1])
+    prob_output = next(d for d in output_details if d['shape'][-1] == 1)
+    output = interpreter.get_tensor(prob_output['index'])
     
     # Get prediction
     # Assuming binary classification: [Normal, Cancer] or [Cancer, Normal]
@@ -296,7 +301,8 @@ def main():
             with st.spinner("🔄 Sedang menganalisis gambar..."):
                 try:
                     # Preprocess image
-                    processed_image = preprocess_image(image)
+                    input_dtype = interpreter.get_input_details()[0]['dtype']
+                    processed_image = preprocess_image(image, dtype=input_dtype)
                     
                     # Make prediction
                     prediction, confidence = predict(interpreter, processed_image)
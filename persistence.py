@@ -0,0 +1,215 @@
+"""
+Antrian background untuk menyimpan gambar + hasil prediksi (data re-training)
+di luar jalur request /predict
+
+Request hanya memasukkan item ke antrian (put_nowait); jika antrian penuh,
+item dibuang dan dihitung sebagai dropped, tidak pernah menahan request.
+Thread writer mengumpulkan item per batch lalu menulis ke store dengan retry.
+
+Gambar disimpan sebagai JPEG/PNG karena hanya itu yang dibaca pipeline
+training (flow_from_directory, organize_dataset, batch_score); upload WebP/AVIF
+di-transcode ke PNG (lossless) di thread writer.
+
+Store dipilih lewat PERSIST_STORE:
+    dir:/path/ke/folder   -> LocalDirectoryStore
+    memory                -> ObjectStore dengan InMemoryObjectClient (stand-in,
+                             tidak durable: /config tidak melaporkan persist)
+"""
+
+import io
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from PIL import Image
+
+
+def make_filename(prediction, timestamp, ext):
+    # Format yang dibaca parse_filename() di download_from_drive.py:
+    # oral_cancer_2024-02-15T10-30-00_75pct.jpg (persentase = prob kanker)
+    stamp = timestamp.strftime('%Y-%m-%dT%H-%M-%S-%f')
+    return f"oral_cancer_{stamp}_{round((1 - prediction) * 100)}pct.{ext}"
+
+
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png'}
+
+
+def guess_extension(image_bytes):
+    if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    return 'jpg'
+
+
+def storable_bytes(image_bytes):
+    """JPEG/PNG apa adanya; format lain (WebP/AVIF) di-transcode ke PNG"""
+    if image_bytes[:3] == b'\xff\xd8\xff' or image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        return image_bytes
+    buffer = io.BytesIO()
+    Image.open(io.BytesIO(image_bytes)).convert('RGB').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class LocalDirectoryStore:
+    """Simpan gambar dan metadata JSON ke folder lokal, satu subfolder per hari"""
+    durable = True
+
+    def __init__(self, root):
+        self.root = root
+
+    def write_batch(self, items):
+        for item in items:
+            day_dir = os.path.join(self.root, item['timestamp'].strftime('%Y-%m-%d'))
+            os.makedirs(day_dir, exist_ok=True)
+            filename = make_filename(item['prediction'], item['timestamp'], guess_extension(item['image_bytes']))
+            path = os.path.join(day_dir, filename)
+            with open(path, 'wb') as f:
+                f.write(item['image_bytes'])
+            with open(os.path.splitext(path)[0] + '.json', 'w') as f:
+                json.dump(item['metadata'], f)
+
+
+class InMemoryObjectClient:
+    """
+    Stand-in object store dengan interface put_object seperti boto3 S3 client,
+    untuk development dan pengujian tanpa kredensial cloud. Hanya menyimpan
+    max_objects objek terakhir supaya RSS worker tidak terus tumbuh
+    """
+    durable = False
+
+    def __init__(self, max_objects=512):
+        self.max_objects = max_objects
+        self.objects = {}
+        self.evicted = 0
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[(Bucket, Key)] = Body
+        while len(self.objects) > self.max_objects:
+            # dict terurut sesuai penyisipan: buang yang paling lama
+            del self.objects[next(iter(self.objects))]
+            self.evicted += 1
+
+
+class ObjectStore:
+    """Tulis ke object store apa pun yang punya put_object(Bucket, Key, Body, ContentType)"""
+
+    def __init__(self, client, bucket, prefix='uploads/'):
+        self.durable = getattr(client, 'durable', True)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def write_batch(self, items):
+        for item in items:
+            ext = guess_extension(item['image_bytes'])
+            key = self.prefix + item['timestamp'].strftime('%Y-%m-%d/') + \
+                make_filename(item['prediction'], item['timestamp'], ext)
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=item['image_bytes'],
+                                   ContentType=CONTENT_TYPES[ext])
+            self.client.put_object(Bucket=self.bucket, Key=os.path.splitext(key)[0] + '.json',
+                                   Body=json.dumps(item['metadata']).encode(),
+                                   ContentType='application/json')
+
+
+def store_from_config(spec):
+    if spec.startswith('dir:'):
+        return LocalDirectoryStore(spec[len('dir:'):])
+    if spec == 'memory':
+        print("PERSIST_STORE=memory: uploads are kept in memory only (development/testing), "
+              "not collected for retraining")
+        return ObjectStore(InMemoryObjectClient(), 'training-data')
+    raise ValueError(f"Unknown PERSIST_STORE: {spec}")
+
+
+class PersistenceQueue:
+    def __init__(self, store, maxsize=256, batch_size=16, flush_seconds=2.0,
+                 max_retries=3, retry_backoff=1.0):
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.maxsize = maxsize
+        self._start()
+        # Thread tidak ikut ter-fork: dengan gunicorn --preload objek ini dibuat
+        # di master, jadi tiap worker memulai antrian dan writer-nya sendiri
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.maxsize)
+        self._lock = threading.Lock()
+        self.counters = {'enqueued': 0, 'dropped': 0, 'written': 0, 'failed': 0, 'retries': 0}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def submit(self, image_bytes, prediction, metadata=None):
+        """Masukkan item ke antrian tanpa pernah blocking. Return False jika dibuang"""
+        item = {
+            'image_bytes': image_bytes,
+            'prediction': prediction,
+            'timestamp': datetime.now(timezone.utc),
+            'metadata': dict(metadata or {}, prediction_value=prediction),
+        }
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('enqueued')
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            writable = []
+            for item in batch:
+                try:
+                    item['image_bytes'] = storable_bytes(item['image_bytes'])
+                    writable.append(item)
+                except Exception as e:
+                    print(f"Persistence transcode failed, dropping item: {e}")
+                    self._count('failed')
+            for attempt in range(self.max_retries + 1 if writable else 0):
+                try:
+                    self.store.write_batch(writable)
+                    self._count('written', len(writable))
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        print(f"Persistence failed, dropping {len(writable)} items: {e}")
+                        self._count('failed', len(writable))
+                    else:
+                        self._count('retries')
+                        time.sleep(self.retry_backoff * 2 ** attempt)
+            for _ in batch:
+                self._queue.task_done()
+
+    def join(self):
+        """Tunggu sampai semua item di antrian selesai diproses"""
+        self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_capacity'] = self._queue.maxsize
+        return stats
@@ -0,0 +1,88 @@
+"""
+Sampling profiler dan log request lambat untuk app.py
+
+Profiler hanya berjalan selama diminta lewat endpoint admin; di luar itu
+tidak ada thread, hook, atau overhead apa pun pada request.
+"""
+
+import collections
+import json
+import sys
+import threading
+import time
+
+
+class SamplingProfiler:
+    """
+    Ambil stack semua thread setiap `interval` detik lewat
+    sys._current_frames() dan hitung dalam format collapsed stack
+    (satu baris "frame;frame;frame count"), siap untuk flamegraph.pl
+    atau speedscope
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.samples = 0
+
+    @staticmethod
+    def _frame_name(frame):
+        code = frame.f_code
+        filename = code.co_filename.rsplit('/', 1)[-1]
+        return f"{code.co_name} ({filename}:{frame.f_lineno})"
+
+    def _sample(self, own_ident):
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self, seconds):
+        own_ident = threading.get_ident()
+        deadline = time.perf_counter() + seconds
+        next_tick = time.perf_counter()
+        while next_tick < deadline:
+            self._sample(own_ident)
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return self.collapsed()
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class SlowRequestLog:
+    """
+    Simpan request yang melewati threshold_ms (beserta timing per tahap)
+    ke ring buffer dan cetak sebagai satu baris JSON ke log server
+    """
+
+    def __init__(self, threshold_ms, maxlen=200):
+        self.threshold_ms = threshold_ms
+        self.entries = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, total_ms, **details):
+        if total_ms < self.threshold_ms:
+            return False
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'total_ms': round(total_ms, 2),
+            **details,
+        }
+        with self._lock:
+            self.entries.append(entry)
+        print(f"SLOW_REQUEST {json.dumps(entry)}")
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.entries)
@@ -0,0 +1,198 @@
+"""
+Pre-screen kualitas gambar sebelum inferensi (dan filter data training)
+
+Semua metrik dihitung dengan NumPy pada thumbnail kecil (THUMB_SIZE px),
+jauh lebih murah daripada satu invoke MobileNetV2:
+    sharpness      variance Laplacian 3x3 (rendah = blur)
+    brightness     rata-rata luminance 0-255
+    dark/clipped   porsi piksel sangat gelap / hampir putih
+    red_fraction   porsi piksel dengan R dominan (mukosa, gusi, bibir)
+    colorfulness   metrik Hasler & Süsstrunk (rendah = abu-abu/monokrom)
+
+Threshold default adalah titik awal untuk foto intraoral dan bisa diubah
+lewat QUALITY_THRESHOLDS (JSON) di app.py atau --thresholds di CLI.
+
+Contoh (filter data training):
+    python quality.py downloaded_dataset
+    python quality.py downloaded_dataset --report quality.csv --move downloaded_dataset/low_quality
+"""
+
+import argparse
+import collections
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+THUMB_SIZE = 64
+
+DEFAULT_THRESHOLDS = {
+    'min_sharpness': 15.0,
+    'min_brightness': 40.0,
+    'max_brightness': 225.0,
+    'max_dark_fraction': 0.6,
+    'max_clipped_fraction': 0.4,
+    'min_red_fraction': 0.25,
+    'min_colorfulness': 8.0,
+}
+
+METRICS = ['sharpness', 'brightness', 'dark_fraction', 'clipped_fraction', 'red_fraction', 'colorfulness']
+
+LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def thumbnail(img):
+    # reduce() = box filter dengan faktor bulat, jauh lebih murah dari resize;
+    # sisi terpendek hasilnya antara THUMB_SIZE dan 2 * THUMB_SIZE
+    factor = max(1, min(img.size) // THUMB_SIZE)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return np.asarray(img.reduce(factor) if factor > 1 else img, dtype=np.float32)
+
+
+def measure(rgb):
+    """rgb: array float32 (h, w, 3) 0-255. Return dict metrik"""
+    gray = rgb @ LUMA
+    laplacian = (gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1]
+                 - 4 * gray[1:-1, 1:-1])
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    return {
+        'sharpness': float(laplacian.var()),
+        'brightness': float(gray.mean()),
+        'dark_fraction': float(np.mean(gray < 25)),
+        'clipped_fraction': float(np.mean(gray > 245)),
+        'red_fraction': float(np.mean((r > g) & (r > b))),
+        'colorfulness': float(np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())),
+    }
+
+
+def assess(metrics, thresholds=DEFAULT_THRESHOLDS):
+    """Return daftar masalah; kosong berarti gambar layak dinilai"""
+    issues = []
+    if metrics['sharpness'] < thresholds['min_sharpness']:
+        issues.append('blurry')
+    if (metrics['brightness'] < thresholds['min_brightness']
+            or metrics['dark_fraction'] > thresholds['max_dark_fraction']):
+        issues.append('underexposed')
+    if (metrics['brightness'] > thresholds['max_brightness']
+            or metrics['clipped_fraction'] > thresholds['max_clipped_fraction']):
+        issues.append('overexposed')
+    if (metrics['red_fraction'] < thresholds['min_red_fraction']
+            or metrics['colorfulness'] < thresholds['min_colorfulness']):
+        issues.append('not_intraoral')
+    return issues
+
+
+def check_image(img, thresholds=DEFAULT_THRESHOLDS):
+    metrics = measure(thumbnail(img))
+    return metrics, assess(metrics, thresholds)
+
+
+def load_thresholds(spec=None):
+    """Gabungkan DEFAULT_THRESHOLDS dengan override JSON, contoh '{"min_sharpness": 30}'"""
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if spec:
+        overrides = json.loads(spec)
+        unknown = set(overrides) - set(DEFAULT_THRESHOLDS)
+        if unknown:
+            raise ValueError(f"Unknown quality thresholds: {sorted(unknown)}")
+        thresholds.update({k: float(v) for k, v in overrides.items()})
+    return thresholds
+
+
+class QualityStats:
+    def __init__(self, history=2000):
+        self.checked = 0
+        self.rejected = 0
+        self.issues = collections.Counter()
+        self.latencies_ms = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+
+    def record(self, issues, latency_ms, rejected=False):
+        with self._lock:
+            self.checked += 1
+            self.rejected += rejected
+            self.issues.update(issues)
+            self.latencies_ms.append(latency_ms)
+
+    def stats(self):
+        with self._lock:
+            stats = {'checked': self.checked, 'rejected': self.rejected, 'issues': dict(self.issues)}
+            latencies = np.array(self.latencies_ms)
+        if latencies.size:
+            p50, p99 = np.percentile(latencies, [50, 99])
+            stats['latency_ms'] = {'p50': float(p50), 'p99': float(p99)}
+        return stats
+
+
+def scan_directory(directory, thresholds=DEFAULT_THRESHOLDS, exclude=None):
+    """Return [(path, metrics, issues)] untuk semua gambar di directory (rekursif)"""
+    results = []
+    exclude = os.path.abspath(exclude) if exclude else None
+    for root, dirs, files in os.walk(directory):
+        # Jangan memeriksa ulang folder tujuan --move dari run sebelumnya
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != exclude]
+        for filename in sorted(files):
+            if not filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                continue
+            path = os.path.join(root, filename)
+            try:
+                with Image.open(path) as img:
+                    # draft(): decoder JPEG langsung menghasilkan versi kecil
+                    img.draft('RGB', (THUMB_SIZE * 2, THUMB_SIZE * 2))
+                    metrics, issues = check_image(img, thresholds)
+            except Exception as e:
+                print(f"✗ {path}: {e}")
+                continue
+            results.append((path, metrics, issues))
+    return results
+
+
+def filter_directory(directory, move_to=None, report=None, thresholds=DEFAULT_THRESHOLDS):
+    start = time.perf_counter()
+    results = scan_directory(directory, thresholds, exclude=move_to)
+    elapsed = time.perf_counter() - start
+    rejected = [(path, issues) for path, _, issues in results if issues]
+
+    counts = collections.Counter(issue for _, issues in rejected for issue in issues)
+    print(f"🔍 {len(results)} gambar diperiksa dalam {elapsed:.1f}s, {len(rejected)} tidak layak")
+    for issue, count in counts.most_common():
+        print(f"  {issue}: {count}")
+
+    if report:
+        with open(report, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['path', *METRICS, 'issues'])
+            for path, metrics, issues in results:
+                writer.writerow([path, *(f'{metrics[k]:.4f}' for k in METRICS), ';'.join(issues)])
+        print(f"✓ Laporan disimpan: {report}")
+
+    if move_to:
+        for path, _ in rejected:
+            # Pertahankan subfolder kelas (cancer/normal) di folder tujuan
+            target = os.path.join(move_to, os.path.relpath(path, directory))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        print(f"✓ {len(rejected)} gambar dipindahkan ke {move_to}")
+    return rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory')
+    parser.add_argument('--move', help='pindahkan gambar tidak layak ke folder ini')
+    parser.add_argument('--report', help='tulis metrik per gambar ke CSV')
+    parser.add_argument('--thresholds', help='override threshold (JSON)')
+    args = parser.parse_args()
+    filter_directory(args.directory, args.move, args.report, load_thresholds(args.thresholds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Scheduler dengan beberapa jalur prioritas di depan interpreter
+
+Interpreter TFLite tidak thread-safe, jadi hanya `capacity` request yang
+boleh menjalankan invoke bersamaan (1 interpreter = capacity 1). Jika ada
+antrian di beberapa jalur, slot berikutnya diberikan dengan stride
+scheduling: tiap jalur mendapat porsi sesuai `share`, sehingga jalur bulk
+tetap jalan tetapi tidak bisa menahan jalur interaktif.
+"""
+
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Lane:
+    def __init__(self, name, share, max_queue):
+        if share <= 0:
+            raise ValueError(f"Lane {name}: share harus > 0 (dapat {share})")
+        self.name = name
+        self.share = share
+        self.max_queue = max_queue
+        self.waiting = collections.deque()
+        self.pass_value = 0.0
+        self.granted = 0
+        self.rejected = 0
+        self.wait_ms = collections.deque(maxlen=2000)
+
+
+class PriorityScheduler:
+    def __init__(self, lanes, capacity=1):
+        """
+        lanes: {nama: (share, max_queue)}, contoh
+        {'interactive': (0.8, 64), 'bulk': (0.2, 256)}
+        """
+        self.capacity = capacity
+        self.in_use = 0
+        # pass_value jalur yang terakhir dipilih (minimum jalur aktif saat itu)
+        self.virtual_time = 0.0
+        self.lanes = {name: Lane(name, share, max_queue)
+                      for name, (share, max_queue) in lanes.items()}
+        self._lock = threading.Lock()
+
+    def _grant_next(self):
+        # Dipanggil dengan lock dipegang
+        while self.in_use < self.capacity:
+            candidates = [lane for lane in self.lanes.values() if lane.waiting]
+            if not candidates:
+                return
+            lane = min(candidates, key=lambda l: l.pass_value)
+            self.virtual_time = lane.pass_value
+            lane.pass_value += 1.0 / lane.share
+            event = lane.waiting.popleft()
+            self.in_use += 1
+            event.set()
+
+    def acquire(self, lane_name):
+        lane = self.lanes[lane_name]
+        event = threading.Event()
+        start = time.perf_counter()
+        with self._lock:
+            if len(lane.waiting) >= lane.max_queue:
+                lane.rejected += 1
+                raise QueueFull(lane_name)
+            if not lane.waiting:
+                # Jalur yang baru aktif kembali tidak boleh "menabung" giliran
+                # selama idle: mulai dari minimum jalur yang sedang aktif
+                active = [l.pass_value for l in self.lanes.values() if l.waiting]
+                lane.pass_value = max(lane.pass_value, min(active) if active else self.virtual_time)
+            lane.waiting.append(event)
+            self._grant_next()
+        event.wait()
+        wait_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            lane.granted += 1
+            lane.wait_ms.append(wait_ms)
+        return wait_ms
+
+    def release(self):
+        with self._lock:
+            self.in_use -= 1
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, lane_name):
+        wait_ms = self.acquire(lane_name)
+        try:
+            yield wait_ms
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._lock:
+            stats = {'capacity': self.capacity, 'in_use': self.in_use, 'lanes': {}}
+            for lane in self.lanes.values():
+                waits = np.array(lane.wait_ms)
+                lane_stats = {
+                    'share': lane.share,
+                    'queue_depth': len(lane.waiting),
+                    'max_queue': lane.max_queue,
+                    'granted': lane.granted,
+                    'rejected': lane.rejected,
+                }
+                if waits.size:
+                    p50, p99 = np.percentile(waits, [50, 99])
+                    lane_stats['queue_ms'] = {'p50': float(p50), 'p99': float(p99),
+                                              'max': float(waits.max())}
+                stats['lanes'][lane.name] = lane_stats
+        return stats
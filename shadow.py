@@ -0,0 +1,137 @@
+"""
+Shadow evaluation: model kandidat ikut menilai sampel trafik /predict di
+thread background berprioritas rendah, tanpa mengubah respons ke pengguna
+
+Request hanya memasukkan (gambar input, skor yang benar-benar dikirim ke
+pengguna, tahap yang menjawab) ke antrian kecil; jika antrian penuh sampel
+dilewati. Resize, invoke kandidat dan statistik semuanya terjadi di thread
+shadow, jadi jalur live (termasuk cascade) tidak berubah.
+"""
+
+import collections
+import os
+import queue
+import random
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+
+class ShadowEvaluator:
+    def __init__(self, model_path, sample_rate=0.1, classify=None, maxsize=32, history=2000):
+        import tensorflow as tf
+
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        # classify(prob_cancer) -> label keputusan, sama dengan yang dipakai app
+        self.classify = classify or (lambda p: p >= 0.5)
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=1)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.prob_output = next(d for d in self.interpreter.get_output_details()
+                                if d['shape'][-1] == 1)
+
+        self.maxsize = maxsize
+        self.history = history
+        self._start()
+        # Thread tidak ikut ter-fork (gunicorn --preload): mulai ulang di tiap worker
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self._queue = queue.Queue(maxsize=self.maxsize)
+        self._lock = threading.Lock()
+        self.counters = {'sampled': 0, 'skipped_full': 0, 'evaluated': 0, 'errors': 0,
+                         'agree_binary': 0, 'agree_decision': 0}
+        # Pembanding = tahap yang menjawab (fast/full/tta), dihitung per tahap
+        self.by_stage = collections.Counter()
+        self.deltas = collections.deque(maxlen=self.history)
+        self.latencies_ms = collections.deque(maxlen=self.history)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def should_sample(self):
+        return random.random() < self.sample_rate
+
+    def submit(self, image, primary_prediction, stage='full'):
+        """image: PIL RGB atau array uint8 (h, w, 3); di-resize di thread shadow"""
+        try:
+            self._queue.put_nowait((image, primary_prediction, stage))
+        except queue.Full:
+            with self._lock:
+                self.counters['skipped_full'] += 1
+            return False
+        with self._lock:
+            self.counters['sampled'] += 1
+        return True
+
+    def _score(self, image):
+        _, height, width, _ = self.input_details[0]['shape']
+        if not isinstance(image, Image.Image):
+            image = Image.fromarray(image)
+        if image.size != (width, height):
+            # Upload resolusi penuh (tahap fast) atau kandidat dengan
+            # resolusi input berbeda (lihat --sweep)
+            image = image.resize((int(width), int(height)))
+        img_array = np.asarray(image)
+        if self.input_details[0]['dtype'] != np.uint8:
+            img_array = img_array.astype(np.float32) / 255.0
+        self.interpreter.set_tensor(self.input_details[0]['index'], np.expand_dims(img_array, axis=0))
+        self.interpreter.invoke()
+        return float(self.interpreter.get_tensor(self.prob_output['index'])[0][0])
+
+    def _run(self):
+        # Turunkan prioritas thread ini saja (Linux: nice per thread)
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+
+        while True:
+            image, primary, stage = self._queue.get()
+            try:
+                start = time.perf_counter()
+                candidate = self._score(image)
+                latency_ms = (time.perf_counter() - start) * 1000
+            except Exception as e:
+                print(f"Shadow evaluation error: {e}")
+                with self._lock:
+                    self.counters['errors'] += 1
+                continue
+
+            primary_cancer, candidate_cancer = 1 - primary, 1 - candidate
+            with self._lock:
+                self.counters['evaluated'] += 1
+                self.by_stage[stage] += 1
+                self.counters['agree_binary'] += (primary_cancer >= 0.5) == (candidate_cancer >= 0.5)
+                self.counters['agree_decision'] += \
+                    self.classify(primary_cancer) == self.classify(candidate_cancer)
+                self.deltas.append(candidate_cancer - primary_cancer)
+                self.latencies_ms.append(latency_ms)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            by_stage = dict(self.by_stage)
+            deltas = np.array(self.deltas)
+            latencies = np.array(self.latencies_ms)
+        evaluated = counters['evaluated']
+        stats = {
+            'candidate': self.model_path,
+            'sample_rate': self.sample_rate,
+            'queue_depth': self._queue.qsize(),
+            **counters,
+            'evaluated_by_stage': by_stage,
+            'agreement_binary': counters['agree_binary'] / evaluated if evaluated else None,
+            'agreement_decision': counters['agree_decision'] / evaluated if evaluated else None,
+        }
+        if deltas.size:
+            stats['prob_cancer_delta'] = {
+                'mean': float(deltas.mean()),
+                'mean_abs': float(np.abs(deltas).mean()),
+                'p95_abs': float(np.percentile(np.abs(deltas), 95)),
+            }
+            p50, p99 = np.percentile(latencies, [50, 99])
+            stats['candidate_latency_ms'] = {'p50': float(p50), 'p99': float(p99)}
+        return stats
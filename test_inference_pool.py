@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from inference_pool import InferencePool
+
+IMG_SIZE = 8
+
+
+def fake_runner(model_path, num_threads):
+    """model_path = lama invoke (detik). Skor = rata-rata piksel / 255; piksel 255 = proses mati"""
+    delay = float(model_path)
+
+    def score(batch):
+        if batch.min() == 255:
+            os._exit(1)
+        time.sleep(delay)
+        return float(batch.mean()) / 255
+
+    return 'uint8', score
+
+
+def image(value):
+    return np.full((IMG_SIZE, IMG_SIZE, 3), value, dtype=np.uint8)
+
+
+def make_pool(delay=0.0, workers=2, slots=8, timeout=5.0):
+    return InferencePool(str(delay), workers=workers, slots=slots, img_size=IMG_SIZE, timeout=timeout,
+                         lanes={'interactive': 0.8, 'bulk': 0.2}, runner=fake_runner,
+                         monitor_interval=0.05).start()
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def pool():
+    pool = make_pool()
+    yield pool
+    pool.close()
+
+
+def test_concurrent_requests_get_their_own_scores(pool):
+    errors = []
+
+    def client(seed):
+        rng = np.random.default_rng(seed)
+        for i in range(20):
+            value = int(rng.integers(1, 255))
+            score = pool.score(image(value), lane='bulk' if i % 3 == 0 else 'interactive')
+            if abs(score - value / 255) > 1e-6:
+                errors.append((value, score))
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert pool.stats()['slots_in_use'] == 0
+
+
+def test_dead_worker_is_respawned_and_its_slot_reaped(pool):
+    start = time.monotonic()
+    with pytest.raises(RuntimeError):
+        pool.score(image(255))
+    # Diketahui lewat monitor, bukan menunggu timeout 5 detik
+    assert time.monotonic() - start < 2
+    wait_for(lambda: pool.stats()['alive'] == 2)
+    stats = pool.stats()
+    assert stats['respawned'] == 1 and stats['reaped'] == 1
+    assert pool.score(image(51)) == pytest.approx(0.2)
+    assert pool.stats()['slots_in_use'] == 0
+
+
+def test_interactive_overtakes_queued_bulk():
+    pool = make_pool(delay=0.05, workers=1, slots=8)
+    try:
+        order = []
+
+        def client(lane):
+            pool.score(image(10), lane=lane)
+            order.append(lane)
+
+        bulk = [threading.Thread(target=client, args=('bulk',)) for _ in range(10)]
+        for thread in bulk:
+            thread.start()
+        # Bulk tidak boleh memakai slot cadangan (reserved = 1)
+        wait_for(lambda: pool.stats()['slots_in_use'] == 7)
+        time.sleep(0.05)
+        assert pool.stats()['slots_in_use'] == 7
+        interactive = threading.Thread(target=client, args=('interactive',))
+        interactive.start()
+        for thread in bulk + [interactive]:
+            thread.join()
+        assert order.index('interactive') <= 2
+    finally:
+        pool.close()
+
+
+def test_timed_out_slot_is_returned_by_worker():
+    pool = make_pool(delay=0.3, workers=1, slots=2, timeout=0.1)
+    try:
+        with pytest.raises(TimeoutError):
+            pool.score(image(10))
+        assert pool.stats()['slots_abandoned'] == 1
+        wait_for(lambda: pool.stats()['slots_in_use'] == 0)
+    finally:
+        pool.close()
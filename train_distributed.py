@@ -0,0 +1,308 @@
+"""
+Training data-parallel multi-proses di CPU untuk train_model.py
+
+Setiap worker adalah proses lokal dengan MultiWorkerMirroredStrategy
+(all-reduce gradien sinkron lewat localhost). Dataset di-shard per worker
+dan setiap worker menjalankan jumlah step yang sama supaya all-reduce
+tidak menggantung di akhir epoch.
+
+Contoh:
+    python train_model.py --workers 4
+    python train_distributed.py --scaling-report            # 1, 2, 4, 8 worker
+    python train_distributed.py --scaling-report --workers-list 1 2 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import tempfile
+import time
+import multiprocessing
+
+import numpy as np
+import tensorflow as tf
+
+from train_model import (
+    BATCH_SIZE,
+    DATA_DIR,
+    EPOCHS,
+    IMG_SIZE,
+    create_model,
+)
+
+SEED = 1337
+FINAL_MODEL_PATH = 'oral_cancer_model.h5'
+SCALING_REPORT_PATH = 'scaling_report.json'
+
+
+def free_ports(n):
+    sockets = [socket.socket() for _ in range(n)]
+    for s in sockets:
+        s.bind(('localhost', 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def augmentation():
+    """Padanan augmentasi ImageDataGenerator di prepare_data() sebagai layer Keras"""
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomFlip('horizontal'),
+        tf.keras.layers.RandomRotation(30 / 360, fill_mode='nearest'),
+        tf.keras.layers.RandomTranslation(0.3, 0.3, fill_mode='nearest'),
+        tf.keras.layers.RandomZoom(0.2, fill_mode='nearest'),
+    ])
+
+
+def split_files(data_dir=DATA_DIR, validation_split=0.2):
+    """
+    Return (train, val), masing-masing (paths, labels). Label = index kelas
+    urut abjad (cancer=0, normal=1) seperti flow_from_directory. Urutan file
+    diacak dengan SEED, jadi sama di semua worker
+    """
+    paths, labels = [], []
+    classes = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    for label, class_name in enumerate(classes):
+        class_dir = os.path.join(data_dir, class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                paths.append(os.path.join(class_dir, filename))
+                labels.append(label)
+    order = np.random.RandomState(SEED).permutation(len(paths))
+    paths = [paths[i] for i in order]
+    labels = np.array(labels, dtype=np.float32)[order]
+    num_val = int(len(paths) * validation_split)
+    split = len(paths) - num_val
+    return (paths[:split], labels[:split]), (paths[split:], labels[split:])
+
+
+def validation_files(img_size=IMG_SIZE):
+    """Path gambar validasi split seeded di make_datasets() (untuk manifest inkremental)"""
+    _, (val_paths, _) = split_files()
+    return val_paths
+
+
+def make_datasets(num_workers, worker_index, img_size, batch_size):
+    """
+    Dataset train/val yang sudah di-shard untuk worker ini.
+
+    Daftar path (urutan sama di semua worker) di-shard(n, i) sebelum decode,
+    jadi tiap worker hanya membaca dan men-decode file bagiannya sendiri.
+    Auto-shard bawaan dimatikan supaya tidak di-shard dua kali.
+    """
+    (train_paths, train_labels), (val_paths, val_labels) = split_files()
+    augment = augmentation()
+
+    def load(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, (img_size, img_size)) / 255.0
+        return image, label
+
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+
+    steps_per_epoch = max(1, len(train_paths) // num_workers // batch_size)
+    validation_steps = max(1, len(val_paths) // num_workers // batch_size)
+
+    train = tf.data.Dataset.from_tensor_slices((train_paths, train_labels)).shard(num_workers, worker_index)
+    train = (train.shuffle(len(train_paths) // num_workers + 1, seed=SEED + worker_index,
+                           reshuffle_each_iteration=True)
+             .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+             .map(lambda x, y: (augment(x, training=True), y),
+                  num_parallel_calls=tf.data.AUTOTUNE)
+             .batch(batch_size)
+             .repeat()
+             .prefetch(tf.data.AUTOTUNE)
+             .with_options(options))
+    val = (tf.data.Dataset.from_tensor_slices((val_paths, val_labels))
+           .shard(num_workers, worker_index)
+           .map(load, num_parallel_calls=tf.data.AUTOTUNE)
+           .batch(batch_size)
+           .repeat()
+           .prefetch(tf.data.AUTOTUNE)
+           .with_options(options))
+    return train, val, steps_per_epoch, validation_steps
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Gambar/detik global, beberapa batch awal (warm-up) tidak dihitung"""
+
+    def __init__(self, global_batch, skip_batches=3):
+        super().__init__()
+        self.global_batch = global_batch
+        self.skip_batches = skip_batches
+        self.batches = 0
+        self.start = None
+        self.images_per_sec = None
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.batches += 1
+        if self.batches == self.skip_batches:
+            self.start = time.perf_counter()
+        elif self.batches > self.skip_batches:
+            measured = self.batches - self.skip_batches
+            self.images_per_sec = measured * self.global_batch / (time.perf_counter() - self.start)
+
+
+def _worker(worker_index, num_workers, ports, config, result_queue):
+    os.environ['TF_CONFIG'] = json.dumps({
+        'cluster': {'worker': [f'localhost:{port}' for port in ports]},
+        'task': {'type': 'worker', 'index': worker_index},
+    })
+
+    # Bagi core CPU antar worker supaya tidak saling berebut thread
+    threads = max(1, (os.cpu_count() or 1) // num_workers)
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+
+    strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    is_chief = worker_index == 0
+    batch_size = config['batch_size']
+    global_batch = batch_size * num_workers
+    lr_scale = num_workers if config['scale_lr'] else 1
+
+    train_ds, val_ds, steps, val_steps = make_datasets(
+        num_workers, worker_index, config['img_size'], batch_size)
+    if config['max_steps']:
+        steps = min(steps, config['max_steps'])
+
+    with strategy.scope():
+        model = create_model(img_size=config['img_size'])
+        model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=0.001 * lr_scale),
+            loss='binary_crossentropy',
+            metrics=['accuracy', tf.keras.metrics.Precision(), tf.keras.metrics.Recall()]
+        )
+
+    # Semua worker ikut menyimpan (operasi kolektif), tapi hanya chief yang
+    # menulis ke path asli; worker lain ke folder sementara yang lalu dihapus
+    checkpoint_dir = os.path.dirname(os.path.abspath(config['checkpoint_path']))
+    if not is_chief:
+        checkpoint_dir = tempfile.mkdtemp(prefix=f'worker{worker_index}_')
+    checkpoint_path = os.path.join(checkpoint_dir, os.path.basename(config['checkpoint_path']))
+
+    throughput = ThroughputCallback(global_batch)
+    callbacks = [
+        # Metrik validasi sudah di-all-reduce, jadi keputusan EarlyStopping
+        # dan ReduceLROnPlateau sama di semua worker
+        tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=3, min_lr=1e-7),
+        tf.keras.callbacks.ModelCheckpoint(checkpoint_path, monitor='val_accuracy',
+                                           save_best_only=True, mode='max'),
+        throughput,
+    ]
+
+    model.fit(train_ds, validation_data=val_ds, epochs=config['epochs'],
+              steps_per_epoch=steps, validation_steps=val_steps,
+              callbacks=callbacks, verbose=1 if is_chief else 0)
+
+    if config['fine_tune_epochs']:
+        with strategy.scope():
+            base_model = model.layers[0]
+            base_model.trainable = True
+            for layer in base_model.layers[:-30]:
+                layer.trainable = False
+            model.compile(
+                optimizer=tf.keras.optimizers.Adam(learning_rate=1e-5 * lr_scale),
+                loss='binary_crossentropy',
+                metrics=['accuracy']
+            )
+        model.fit(train_ds, validation_data=val_ds, epochs=config['fine_tune_epochs'],
+                  steps_per_epoch=steps, validation_steps=val_steps,
+                  callbacks=callbacks[:-1], verbose=1 if is_chief else 0)
+
+    final_path = config['final_path'] if is_chief else os.path.join(checkpoint_dir, 'final.h5')
+    if final_path:
+        model.save(final_path)
+
+    if is_chief:
+        result_queue.put({'images_per_sec': throughput.images_per_sec})
+    else:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+
+
+def run_workers(num_workers, img_size=IMG_SIZE, batch_size=BATCH_SIZE, epochs=EPOCHS,
+                fine_tune_epochs=10, checkpoint_path='best_model.h5', final_path=FINAL_MODEL_PATH,
+                scale_lr=False, max_steps=None):
+    """
+    Jalankan training di num_workers proses lokal. Return hasil dari chief
+    """
+    config = {
+        'img_size': img_size,
+        'batch_size': batch_size,
+        'epochs': epochs,
+        'fine_tune_epochs': fine_tune_epochs,
+        'checkpoint_path': checkpoint_path,
+        'final_path': final_path,
+        'scale_lr': scale_lr,
+        'max_steps': max_steps,
+    }
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    ports = free_ports(num_workers)
+    processes = [ctx.Process(target=_worker, args=(i, num_workers, ports, config, result_queue))
+                 for i in range(num_workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    failed = [i for i, p in enumerate(processes) if p.exitcode != 0]
+    if failed:
+        raise RuntimeError(f"Worker {failed} gagal")
+    return result_queue.get()
+
+
+def train_distributed(num_workers, **kwargs):
+    """
+    Training penuh (frozen + fine-tune) lalu muat model akhir di proses ini
+    """
+    print(f"🚀 Training data-parallel dengan {num_workers} worker CPU...")
+    result = run_workers(num_workers, **kwargs)
+    print(f"📊 Throughput: {result['images_per_sec'] or 0:.1f} gambar/detik")
+    return tf.keras.models.load_model(kwargs.get('final_path', FINAL_MODEL_PATH))
+
+
+def scaling_report(workers_list=(1, 2, 4, 8), max_steps=30, output=SCALING_REPORT_PATH):
+    """
+    Ukur gambar/detik (fase frozen, max_steps step) untuk tiap jumlah worker
+    """
+    rows = []
+    for n in workers_list:
+        print(f"\n{'='*60}\n⏱️  Scaling: {n} worker\n{'='*60}")
+        result = run_workers(n, epochs=1, fine_tune_epochs=0, max_steps=max_steps,
+                             checkpoint_path=os.path.join(tempfile.gettempdir(), 'scaling.h5'),
+                             final_path=None)
+        rows.append({'workers': n, 'images_per_sec': result['images_per_sec'] or 0.0})
+
+    base = rows[0]
+    print(f"\n{'='*60}")
+    print(f"{'workers':>8}{'img/s':>12}{'speedup':>10}{'efisiensi':>12}")
+    print(f"{'='*60}")
+    for row in rows:
+        if base['images_per_sec']:
+            # Relatif terhadap baris pertama (biasanya 1 worker)
+            row['speedup'] = row['images_per_sec'] / base['images_per_sec']
+            row['efficiency'] = row['speedup'] * base['workers'] / row['workers']
+        print(f"{row['workers']:>8}{row['images_per_sec']:>12.1f}"
+              f"{row.get('speedup', 0):>10.2f}{row.get('efficiency', 0) * 100:>11.0f}%")
+    print(f"{'='*60}")
+
+    with open(output, 'w') as f:
+        json.dump(rows, f, indent=2)
+    print(f"✅ Scaling report disimpan: {output}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scaling-report', action='store_true')
+    parser.add_argument('--workers-list', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--max-steps', type=int, default=30, help='step per pengukuran scaling')
+    args = parser.parse_args()
+    if args.scaling_report:
+        scaling_report(args.workers_list, args.max_steps)
+    else:
+        parser.print_help()
@@ -0,0 +1,270 @@
+"""
+Retraining inkremental: fine-tune best_model.h5 hanya dengan gambar baru
+ditambah sampel replay gambar lama, lalu promosi jika lolos validasi
+
+training_manifest.json mencatat gambar (sha1 isi file) yang sudah dilihat
+model aktif dan riwayat tiap versi: gambar baru, sampel replay, metrik
+kandidat vs model sebelumnya, dan apakah dipromosikan.
+
+Set validasi = gambar validasi training penuh terakhir (split Keras, dicatat
+di manifest) ditambah gambar baru dengan sha1 % 5 == 0. Gambar-gambar ini
+tidak pernah dipakai training oleh versi mana pun, sehingga model lama dan
+kandidat dinilai pada data yang sama-sama belum pernah dilihat. Kandidat
+dipromosikan jika sensitivitas dan spesifisitasnya pada set ini tidak turun
+lebih dari PROMOTION_TOLERANCE poin dibanding model sebelumnya.
+
+Contoh:
+    python train_model.py --incremental
+    python train_incremental.py --record-baseline   # best_model.h5 dari train_model() (split prepare_data)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import tensorflow as tf
+
+from train_distributed import augmentation
+from train_model import BATCH_SIZE, CANCER_THRESHOLD, DATA_DIR, validation_files
+
+MANIFEST_PATH = 'training_manifest.json'
+MODEL_PATH = 'best_model.h5'
+CANDIDATE_PATH = 'candidate_model.h5'
+VERSIONS_DIR = 'model_versions'
+# Jumlah gambar lama per gambar baru yang ikut di-replay
+REPLAY_RATIO = 1.0
+INCREMENTAL_EPOCHS = 5
+# Poin persen penurunan sensitivitas/spesifisitas yang masih diterima
+PROMOTION_TOLERANCE = 0.5
+# Urutan kelas sama dengan flow_from_directory: output model = prob 'normal'
+CLASSES = ['cancer', 'normal']
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def scan_dataset(data_dir=DATA_DIR):
+    """Return {sha1: {'path', 'label'}} untuk semua gambar di data_dir/<kelas>/"""
+    images = {}
+    for label, class_name in enumerate(CLASSES):
+        class_dir = os.path.join(data_dir, class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(('.jpg', '.jpeg', '.png')):
+                path = os.path.join(class_dir, filename)
+                images[file_hash(path)] = {'path': path, 'label': label}
+    return images
+
+
+def is_validation(image_hash):
+    """Split untuk gambar baru (setelah training penuh terakhir)"""
+    return int(image_hash[:8], 16) % 5 == 0
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def record_full_training(val_files, model_path=MODEL_PATH, data_dir=DATA_DIR, manifest_path=MANIFEST_PATH):
+    """
+    Catat model hasil training penuh sebagai versi baru yang sudah melihat
+    semua gambar di data_dir. val_files: gambar validasi training tersebut
+    (tidak dipakai training), dipakai ulang oleh promotion gate
+    """
+    images = scan_dataset(data_dir)
+    manifest = load_manifest(manifest_path) or {'current': 0, 'seen': {}, 'versions': []}
+    version = manifest['current'] + 1
+    manifest['seen'] = {h: version for h in images}
+    manifest['validation'] = sorted({file_hash(path) for path in val_files})
+    manifest['current'] = version
+    manifest['versions'].append({
+        'version': version,
+        'type': 'full',
+        'model': model_path,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'images': len(images),
+        'validation_images': len(manifest['validation']),
+        'promoted': True,
+    })
+    save_manifest(manifest, manifest_path)
+    print(f"✅ Manifest versi {version}: {len(images)} gambar tercatat ({manifest_path})")
+    return manifest
+
+
+def make_dataset(records, img_size, training):
+    paths = [r['path'] for r in records]
+    labels = np.array([r['label'] for r in records], dtype=np.float32)
+
+    def load(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, (img_size, img_size)) / 255.0
+        return image, label
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if training:
+        dataset = dataset.shuffle(len(paths), reshuffle_each_iteration=True)
+    dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+    if training:
+        augment = augmentation()
+        dataset = dataset.map(lambda x, y: (augment(x, training=True), y),
+                              num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE), labels
+
+
+def screening_metrics(model, dataset, labels, threshold=CANCER_THRESHOLD):
+    prob_cancer = 1 - model.predict(dataset, verbose=0)[:, 0]
+    is_cancer = labels == CLASSES.index('cancer')
+    predicted = prob_cancer >= threshold
+    return {
+        'sensitivity': float(np.mean(predicted[is_cancer]) * 100) if is_cancer.any() else None,
+        'specificity': float(np.mean(~predicted[~is_cancer]) * 100) if (~is_cancer).any() else None,
+        'accuracy': float(np.mean(predicted == is_cancer) * 100),
+    }
+
+
+def passes_gate(candidate, previous, tolerance=PROMOTION_TOLERANCE):
+    for key in ('sensitivity', 'specificity'):
+        if candidate[key] is None or previous[key] is None:
+            continue
+        if candidate[key] < previous[key] - tolerance:
+            return False
+    return True
+
+
+def incremental_train(data_dir=DATA_DIR, replay_ratio=REPLAY_RATIO, epochs=INCREMENTAL_EPOCHS,
+                      tolerance=PROMOTION_TOLERANCE, seed=0):
+    """
+    Fine-tune model aktif pada gambar baru + replay. Return entri versi
+    (dengan 'promoted'), atau None jika tidak ada gambar baru
+    """
+    manifest = load_manifest()
+    if manifest is None or not os.path.exists(MODEL_PATH):
+        raise SystemExit(f"Butuh {MODEL_PATH} dan {MANIFEST_PATH}: jalankan training penuh dulu, "
+                         f"atau --record-baseline jika {MODEL_PATH} sudah melihat semua gambar")
+
+    if 'validation' not in manifest:
+        raise SystemExit(f"{MANIFEST_PATH} belum mencatat split validasi training penuh: "
+                         f"jalankan --record-baseline ulang")
+
+    images = scan_dataset(data_dir)
+    seen = manifest['seen']
+    held_out = set(manifest['validation'])
+    new = [h for h in images if h not in seen]
+    new_validation = [h for h in new if is_validation(h)]
+    new_train = [h for h in new if not is_validation(h)]
+    if not new_train:
+        print("✓ Tidak ada gambar training baru sejak versi", manifest['current'])
+        return None
+
+    old_train = [h for h in images if h in seen and h not in held_out]
+    replay = random.Random(seed).sample(old_train, min(len(old_train), int(len(new_train) * replay_ratio)))
+    validation = [h for h in images if h in held_out] + new_validation
+    print(f"📊 {len(new_train)} gambar baru + {len(replay)} replay, validasi {len(validation)} gambar")
+
+    model = tf.keras.models.load_model(MODEL_PATH)
+    img_size = model.input_shape[1]
+    train_ds, _ = make_dataset([images[h] for h in new_train + replay], img_size, training=True)
+    val_ds, val_labels = make_dataset([images[h] for h in validation], img_size, training=False)
+
+    previous_metrics = screening_metrics(model, val_ds, val_labels)
+
+    # Sama dengan fase fine-tune di train_model(): 30 layer teratas backbone
+    base_model = model.layers[0]
+    base_model.trainable = True
+    for layer in base_model.layers[:-30]:
+        layer.trainable = False
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=1e-5),
+        loss='binary_crossentropy',
+        metrics=['accuracy']
+    )
+
+    start = time.time()
+    model.fit(
+        train_ds,
+        validation_data=val_ds,
+        epochs=epochs,
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=2,
+                                                    restore_best_weights=True)],
+        verbose=1
+    )
+    train_seconds = time.time() - start
+    model.save(CANDIDATE_PATH)
+
+    candidate_metrics = screening_metrics(model, val_ds, val_labels)
+    promoted = passes_gate(candidate_metrics, previous_metrics, tolerance)
+
+    version = max(v['version'] for v in manifest['versions']) + 1
+    entry = {
+        'version': version,
+        'type': 'incremental',
+        'base_version': manifest['current'],
+        'model': MODEL_PATH if promoted else CANDIDATE_PATH,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'new_images': new_train,
+        'replay_images': replay,
+        'validation_images': len(validation),
+        'train_seconds': round(train_seconds, 1),
+        'metrics': candidate_metrics,
+        'previous_metrics': previous_metrics,
+        'tolerance': tolerance,
+        'promoted': promoted,
+    }
+
+    if promoted:
+        # Simpan model lama sebelum ditimpa, supaya bisa rollback
+        os.makedirs(VERSIONS_DIR, exist_ok=True)
+        shutil.copy(MODEL_PATH, os.path.join(VERSIONS_DIR, f"best_model_v{manifest['current']}.h5"))
+        shutil.move(CANDIDATE_PATH, MODEL_PATH)
+        # Gambar validasi baru juga dicatat supaya tidak dianggap baru lagi,
+        # dan tetap di set validasi untuk versi berikutnya
+        seen.update({h: version for h in new})
+        manifest['validation'] = sorted(held_out | set(new_validation))
+        manifest['current'] = version
+    manifest['versions'].append(entry)
+    save_manifest(manifest)
+
+    print(f"\n{'='*60}")
+    print(f"{'':<14}{'sebelumnya':>12}{'kandidat':>12}")
+    for key in ('sensitivity', 'specificity', 'accuracy'):
+        prev, cand = previous_metrics[key], candidate_metrics[key]
+        print(f"{key:<14}{'-' if prev is None else f'{prev:.2f}':>12}{'-' if cand is None else f'{cand:.2f}':>12}")
+    print(f"{'='*60}")
+    if promoted:
+        print(f"✅ Versi {version} dipromosikan ke {MODEL_PATH} (training {train_seconds / 60:.1f} menit)")
+    else:
+        print(f"⛔ Versi {version} tidak dipromosikan, kandidat tetap di {CANDIDATE_PATH}")
+    return entry
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--record-baseline', action='store_true',
+                        help=f'catat {MODEL_PATH} (hasil train_model()) sebagai model yang sudah '
+                             f'melihat semua gambar, dengan split validasi prepare_data()')
+    parser.add_argument('--replay-ratio', type=float, default=REPLAY_RATIO)
+    parser.add_argument('--epochs', type=int, default=INCREMENTAL_EPOCHS)
+    parser.add_argument('--tolerance', type=float, default=PROMOTION_TOLERANCE)
+    args = parser.parse_args()
+    if args.record_baseline:
+        record_full_training(validation_files(), data_dir=args.data_dir)
+    else:
+        incremental_train(args.data_dir, args.replay_ratio, args.epochs, args.tolerance)
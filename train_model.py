@@ -9,7 +9,11 @@ from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras import layers, models
 import tensorflowjs as tfjs
 import numpy as np
+import argparse
+import csv
+import multiprocessing
 import os
+import time
 
 # Konfigurasi
 IMG_SIZE = 224
@@ -17,13 +21,28 @@ BATCH_SIZE = 32
 EPOCHS = 20
 DATA_DIR = 'path/to/kaggle/dataset'  # Ganti dengan path dataset Anda
 
-def create_model():
+# Model tahap pertama untuk mode cascade di app.py (kecil dan cepat)
+FAST_ALPHA = 0.35
+FAST_IMG_SIZE = 128
+FAST_TFLITE_PATH = 'oral_cancer_model_fast.tflite'
+
+# Sweep lebar/resolusi backbone (--sweep)
+SWEEP_ALPHAS = [0.35, 0.5, 0.75, 1.0]
+SWEEP_SIZES = [128, 160, 192, 224]
+SWEEP_DIR = 'sweep'
+# Sama dengan rule "Cancer Detected" di app.py
+CANCER_THRESHOLD = 0.8
+
+def create_model(alpha=1.0, img_size=IMG_SIZE, dropout=(0.5, 0.3)):
     """
     Membuat model menggunakan MobileNetV2 (lightweight untuk web)
+    alpha/img_size < default menghasilkan model yang lebih kecil dan cepat
+    dropout: rate untuk dua layer Dropout di head
     """
     # Base model (pretrained)
     base_model = MobileNetV2(
-        input_shape=(IMG_SIZE, IMG_SIZE, 3),
+        input_shape=(img_size, img_size, 3),
+        alpha=alpha,
         include_top=False,
         weights='imagenet'
     )
@@ -36,15 +55,15 @@ def create_model():
         base_model,
         layers.GlobalAveragePooling2D(),
         layers.Dense(256, activation='relu'),
-        layers.Dropout(0.5),
+        layers.Dropout(dropout[0]),
         layers.Dense(128, activation='relu'),
-        layers.Dropout(0.3),
+        layers.Dropout(dropout[1]),
         layers.Dense(1, activation='sigmoid')  # Binary classification
     ])
     
     return model
 
-def prepare_data():
+def prepare_data(img_size=IMG_SIZE, batch_size=BATCH_SIZE):
     """
     Mempersiapkan data training dan validation
     """
@@ -64,8 +83,8 @@ def prepare_data():
     # Training generator
     train_generator = train_datagen.flow_from_directory(
         DATA_DIR,
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
+        target_size=(img_size, img_size),
+        batch_size=batch_size,
         class_mode='binary',
         subset='training',
         shuffle=True
@@ -74,8 +93,8 @@ def prepare_data():
     # Validation generator
     val_generator = train_datagen.flow_from_directory(
         DATA_DIR,
-        target_size=(IMG_SIZE, IMG_SIZE),
-        batch_size=BATCH_SIZE,
+        target_size=(img_size, img_size),
+        batch_size=batch_size,
         class_mode='binary',
         subset='validation',
         shuffle=False
@@ -83,12 +102,35 @@ def prepare_data():
     
     return train_generator, val_generator
 
-def train_model():
+def evaluation_data(img_size=IMG_SIZE, batch_size=BATCH_SIZE):
+    """
+    Split validasi yang sama dengan prepare_data() tetapi tanpa augmentasi
+    (hanya rescale), supaya metrik model TFLite bisa dibandingkan antar run
+    """
+    eval_datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
+    return eval_datagen.flow_from_directory(
+        DATA_DIR,
+        target_size=(img_size, img_size),
+        batch_size=batch_size,
+        class_mode='binary',
+        subset='validation',
+        shuffle=False
+    )
+
+def validation_files(img_size=IMG_SIZE):
+    """
+    Path gambar validasi prepare_data() (split Keras deterministik: 20%
+    pertama per kelas), dicatat di manifest untuk retraining inkremental
+    """
+    _, val_generator = prepare_data(img_size)
+    return val_generator.filepaths
+
+def train_model(alpha=1.0, img_size=IMG_SIZE, checkpoint_path='best_model.h5'):
     """
     Melatih model
     """
-    print("🔧 Membuat model...")
-    model = create_model()
+    print(f"🔧 Membuat model (alpha={alpha}, {img_size}px)...")
+    model = create_model(alpha, img_size)
     
     # Compile model
     model.compile(
@@ -100,7 +142,7 @@ def train_model():
     )
     
     print("📊 Mempersiapkan data...")
-    train_gen, val_gen = prepare_data()
+    train_gen, val_gen = prepare_data(img_size)
     
     # Callbacks
     callbacks = [
@@ -116,7 +158,7 @@ def train_model():
             min_lr=1e-7
         ),
         tf.keras.callbacks.ModelCheckpoint(
-            'best_model.h5',
+            checkpoint_path,
             monitor='val_accuracy',
             save_best_only=True,
             mode='max'
@@ -157,22 +199,74 @@ def train_model():
     
     return model, history
 
-def convert_to_tflite(model):
+def add_uint8_input(model):
+    """
+    Bungkus model dengan input uint8 dan rescale /255 di dalam graph,
+    sama dengan rescale=1./255 di prepare_data(), sehingga server cukup
+    mengirim piksel mentah tanpa konversi float di NumPy
+    """
+    inputs = layers.Input(shape=model.input_shape[1:], dtype='uint8', name='image')
+    x = layers.Rescaling(1./255)(inputs)  # Rescaling meng-cast uint8 ke float32
+    outputs = model(x)
+    return models.Model(inputs, outputs)
+
+def add_extra_outputs(model, embedding=False, feature_map=False):
+    """
+    Tambahkan output setelah output probabilitas, tanpa invoke tambahan di app.py:
+    embedding: hasil GlobalAveragePooling2D (index near-duplicate)
+    feature_map: output conv terakhir backbone, (batch, h, w, c) (heatmap CAM)
+    """
+    inputs = layers.Input(shape=model.input_shape[1:])
+    x, extras = inputs, []
+    for i, layer in enumerate(model.layers):
+        x = layer(x)
+        if feature_map and i == 0:
+            extras.append(x)
+        if embedding and isinstance(layer, layers.GlobalAveragePooling2D):
+            extras.append(x)
+    return models.Model(inputs, [x] + extras)
+
+def save_head_weights(model, output_path):
+    """
+    Simpan bobot Dense setelah GlobalAveragePooling2D (W0, b0, W1, b1, ...)
+    supaya app.py bisa menghitung heatmap dari feature map dengan NumPy
+    """
+    dense = [layer for layer in model.layers if isinstance(layer, layers.Dense)]
+    weights = {}
+    for i, layer in enumerate(dense):
+        kernel, bias = layer.get_weights()
+        weights[f'W{i}'], weights[f'b{i}'] = kernel, bias
+    np.savez(output_path, **weights)
+    print(f"✅ Bobot head disimpan: {output_path}")
+
+def convert_to_tflite(model, uint8_input=False, output_path='oral_cancer_model.tflite',
+                      embedding_output=False, heatmap_output=False):
     """
     Konversi model ke TFLite (untuk web yang lebih ringan)
+    uint8_input=True: normalisasi dimasukkan ke model, input berupa uint8
+    embedding_output=True: tambahkan output embedding (GlobalAveragePooling2D)
+    heatmap_output=True: tambahkan output feature map conv terakhir, dan
+        simpan bobot head ke <output_path>_head.npz untuk heatmap di app.py
     """
     print("\n📦 Mengkonversi ke TFLite...")
     
+    if heatmap_output:
+        save_head_weights(model, os.path.splitext(output_path)[0] + '_head.npz')
+    if embedding_output or heatmap_output:
+        model = add_extra_outputs(model, embedding=embedding_output, feature_map=heatmap_output)
+    if uint8_input:
+        model = add_uint8_input(model)
+    
     # Convert
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
     converter.optimizations = [tf.lite.Optimize.DEFAULT]
     tflite_model = converter.convert()
     
     # Save
-    with open('oral_cancer_model.tflite', 'wb') as f:
+    with open(output_path, 'wb') as f:
         f.write(tflite_model)
     
-    print("✅ Model TFLite disimpan: oral_cancer_model.tflite")
+    print(f"✅ Model TFLite disimpan: {output_path}")
     
     # Cek ukuran
     size_mb = len(tflite_model) / (1024 * 1024)
@@ -207,13 +301,13 @@ def convert_to_onnx():
     
     print("✅ Model ONNX disimpan: oral_cancer_model.onnx")
 
-def evaluate_model(model):
+def evaluate_model(model, img_size=IMG_SIZE):
     """
     Evaluasi performa model
     """
     print("\n📈 Evaluasi model...")
     
-    _, val_gen = prepare_data()
+    _, val_gen = prepare_data(img_size)
     
     results = model.evaluate(val_gen)
     
@@ -243,17 +337,22 @@ input_details = model.get_input_details()
 output_details = model.get_output_details()
 
 # Load and preprocess image
-img = Image.open('test_image.jpg')
+img = Image.open('test_image.jpg').convert('RGB')
 img = img.resize((224, 224))
-img_array = np.array(img) / 255.0
-img_array = np.expand_dims(img_array, axis=0).astype(np.float32)
+if input_details[0]['dtype'] == np.uint8:
+    # Rescale /255 sudah ada di dalam model
+    img_array = np.expand_dims(np.asarray(img, dtype=np.uint8), axis=0)
+else:
+    img_array = np.array(img) / 255.0
+    img_array = np.expand_dims(img_array, axis=0).astype(np.float32)
 
 # Run inference
 model.set_tensor(input_details[0]['index'], img_array)
 model.invoke()
 
 # Get prediction
-prediction = model.get_tensor(output_details[0]['index'])[0][0]
+prob_output = next(d for d in output_details if d['shape'][-1] == 1)
+prediction = model.get_tensor(prob_output['index'])[0][0]
 
 print(f"Cancer probability: {prediction * 100:.2f}%")
 if prediction > 0.7:
@@ -269,12 +368,204 @@ else:
     
     print("✅ Test inference script created: test_inference.py")
 
-if __name__ == "__main__":
+def train_fast_model():
+    """
+    Melatih dan mengekspor model tahap pertama untuk cascade:
+    MobileNetV2 alpha rendah pada resolusi lebih kecil
+    """
+    print("\n⚡ Training model cascade tahap pertama...")
+    fast_model, _ = train_model(FAST_ALPHA, FAST_IMG_SIZE, checkpoint_path='best_model_fast.h5')
+    evaluate_model(fast_model, FAST_IMG_SIZE)
+    convert_to_tflite(fast_model, uint8_input=True, output_path=FAST_TFLITE_PATH)
+    return fast_model
+
+def _benchmark_tflite_worker(tflite_path, runs, batch_size):
+    """
+    Dijalankan di proses terpisah supaya peak RSS hanya milik model ini
+    """
+    import resource
+    
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=1)
+    interpreter.allocate_tensors()
+    details = interpreter.get_input_details()[0]
+    shape = [int(d) for d in details['shape']]
+    sample = np.random.randint(0, 256, size=shape).astype(details['dtype'])
+    
+    # Latensi 1 gambar, 1 thread = biaya CPU per request
+    latencies = []
+    for i in range(runs + 5):
+        start = time.perf_counter()
+        interpreter.set_tensor(details['index'], sample)
+        interpreter.invoke()
+        if i >= 5:
+            latencies.append((time.perf_counter() - start) * 1000)
+    
+    # Throughput dengan batch
+    interpreter.resize_tensor_input(details['index'], [batch_size] + shape[1:])
+    interpreter.allocate_tensors()
+    batch = np.repeat(sample, batch_size, axis=0)
+    start = time.perf_counter()
+    batch_runs = max(1, runs // batch_size)
+    for _ in range(batch_runs):
+        interpreter.set_tensor(details['index'], batch)
+        interpreter.invoke()
+    throughput = batch_runs * batch_size / (time.perf_counter() - start)
+    
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'latency_ms_p50': float(np.percentile(latencies, 50)),
+        'latency_ms_p99': float(np.percentile(latencies, 99)),
+        'throughput_ips': float(throughput),
+        'peak_memory_mb': (peak_kb - baseline_kb) / 1024,
+    }
+
+def benchmark_tflite(tflite_path, runs=50, batch_size=8):
+    """
+    Benchmark latensi CPU, throughput dan peak memory model TFLite
+    """
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        result = pool.apply(_benchmark_tflite_worker, (tflite_path, runs, batch_size))
+    result['file_size_mb'] = os.path.getsize(tflite_path) / (1024 * 1024)
+    return result
+
+def evaluate_tflite(tflite_path, img_size=IMG_SIZE, threshold=CANCER_THRESHOLD):
+    """
+    Sensitivitas/spesifisitas model TFLite (setelah kuantisasi) pada data validasi
+    """
+    val_gen = evaluation_data(img_size)
+    cancer_index = val_gen.class_indices.get('cancer', 0)
+    
+    interpreter = tf.lite.Interpreter(model_path=tflite_path)
+    interpreter.allocate_tensors()
+    details = interpreter.get_input_details()[0]
+    prob_output = next(d for d in interpreter.get_output_details() if d['shape'][-1] == 1)
+    
+    prob_cancer, labels = [], []
+    for i in range(len(val_gen)):
+        images, batch_labels = val_gen[i]
+        if details['dtype'] == np.uint8:
+            # evaluation_data() sudah rescale ke 0-1; model uint8 rescale sendiri
+            images = np.round(images * 255).astype(np.uint8)
+        else:
+            images = images.astype(np.float32)
+        if list(details['shape']) != list(images.shape):
+            interpreter.resize_tensor_input(details['index'], list(images.shape))
+            interpreter.allocate_tensors()
+            details = interpreter.get_input_details()[0]
+        interpreter.set_tensor(details['index'], images)
+        interpreter.invoke()
+        # Output sigmoid = probabilitas kelas dengan index 1
+        output = interpreter.get_tensor(prob_output['index'])[:, 0]
+        prob_cancer.extend(output if cancer_index == 1 else 1 - output)
+        labels.extend(batch_labels == cancer_index)
+    
+    prob_cancer, labels = np.array(prob_cancer), np.array(labels, dtype=bool)
+    predicted = prob_cancer >= threshold
+    return {
+        'sensitivity': float(np.mean(predicted[labels]) * 100) if labels.any() else None,
+        'specificity': float(np.mean(~predicted[~labels]) * 100) if (~labels).any() else None,
+        'accuracy': float(np.mean(predicted == labels) * 100),
+    }
+
+def pareto_front(results):
+    """
+    Tandai konfigurasi yang tidak didominasi: tidak ada konfigurasi lain yang
+    lebih cepat (atau sama) dengan sensitivitas dan spesifisitas >=
+    """
+    def key(r):
+        return (r['latency_ms_p50'], -(r['sensitivity'] or 0), -(r['specificity'] or 0))
+    def dominates(a, b):
+        return all(x <= y for x, y in zip(key(a), key(b))) and key(a) != key(b)
+    for r in results:
+        r['pareto'] = not any(dominates(o, r) for o in results)
+    return results
+
+def run_sweep(alphas=SWEEP_ALPHAS, sizes=SWEEP_SIZES, output_dir=SWEEP_DIR):
+    """
+    Latih, ekspor, benchmark dan evaluasi setiap kombinasi alpha x resolusi,
+    lalu tulis tabel Pareto latensi vs akurasi
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+    
+    for alpha in alphas:
+        for img_size in sizes:
+            name = f"mobilenetv2_a{alpha}_{img_size}"
+            print(f"\n{'='*60}\n🔁 Sweep: {name}\n{'='*60}")
+            model, _ = train_model(alpha, img_size,
+                                   checkpoint_path=os.path.join(output_dir, f'{name}.h5'))
+            tflite_path = os.path.join(output_dir, f'{name}.tflite')
+            convert_to_tflite(model, uint8_input=True, output_path=tflite_path)
+            
+            result = {'name': name, 'alpha': alpha, 'img_size': img_size}
+            result.update(benchmark_tflite(tflite_path))
+            result.update(evaluate_tflite(tflite_path, img_size))
+            results.append(result)
+            tf.keras.backend.clear_session()
+    
+    pareto_front(results)
+    results.sort(key=lambda r: r['latency_ms_p50'])
+    
+    csv_path = os.path.join(output_dir, 'sweep_results.csv')
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+    
+    print(f"\n{'='*100}")
+    print(f"{'model':<28}{'p50 ms':>9}{'p99 ms':>9}{'img/s':>9}{'MB':>7}{'mem MB':>9}"
+          f"{'sens %':>9}{'spec %':>9}{'acc %':>9}  pareto")
+    print(f"{'='*100}")
+    for r in results:
+        print(f"{r['name']:<28}{r['latency_ms_p50']:>9.2f}{r['latency_ms_p99']:>9.2f}"
+              f"{r['throughput_ips']:>9.1f}{r['file_size_mb']:>7.2f}{r['peak_memory_mb']:>9.1f}"
+              f"{r['sensitivity']:>9.2f}{r['specificity']:>9.2f}{r['accuracy']:>9.2f}"
+              f"  {'*' if r['pareto'] else ''}")
+    print(f"{'='*100}")
+    print(f"✅ Hasil sweep disimpan: {csv_path}")
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Oral Cancer Detection - Model Training & Conversion")
+    parser.add_argument('--fast-model', action='store_true',
+                        help=f'latih juga model cascade tahap pertama ({FAST_TFLITE_PATH})')
+    parser.add_argument('--sweep', action='store_true',
+                        help='latih dan benchmark kombinasi alpha x resolusi MobileNetV2')
+    parser.add_argument('--sweep-alphas', type=float, nargs='+', default=SWEEP_ALPHAS)
+    parser.add_argument('--sweep-sizes', type=int, nargs='+', default=SWEEP_SIZES)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='jumlah proses training data-parallel di CPU (train_distributed.py)')
+    parser.add_argument('--scale-lr', action='store_true',
+                        help='kalikan learning rate dengan jumlah worker (batch global lebih besar)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='fine-tune best_model.h5 dengan gambar baru saja (train_incremental.py)')
+    parser.add_argument('--search', action='store_true',
+                        help='pencarian hyperparameter paralel dengan early stopping ASHA (hparam_search.py)')
+    parser.add_argument('--search-trials', type=int, default=24)
+    parser.add_argument('--search-workers', type=int, default=2)
+    parser.add_argument('--export-best', action='store_true',
+                        help='ekspor trial terbaik dari hasil --search ke oral_cancer_model.tflite')
+    return parser.parse_args()
+
+def main(args):
     print("🦷 Oral Cancer Detection - Model Training & Conversion")
     print("="*60)
     
     # Training
-    model, history = train_model()
+    if args.workers > 1:
+        from train_distributed import train_distributed, validation_files as distributed_validation_files
+        model = train_distributed(args.workers, scale_lr=args.scale_lr)
+        val_files = distributed_validation_files()
+    else:
+        model, history = train_model()
+        val_files = validation_files()
+    
+    # Catat gambar yang sudah dilihat model ini (dan split validasinya)
+    # untuk --incremental berikutnya
+    from train_incremental import record_full_training
+    record_full_training(val_files)
     
     # Evaluasi
     evaluate_model(model)
@@ -287,10 +578,14 @@ if __name__ == "__main__":
     print("\n🔄 Konversi model ke format web...")
     
     # Pilih salah satu atau semua:
-    convert_to_tflite(model)      # Paling ringan, direkomendasikan
+    convert_to_tflite(model, uint8_input=True, embedding_output=True,
+                      heatmap_output=True)  # Paling ringan, direkomendasikan
     # convert_to_tfjs(model)      # TensorFlow.js (lebih besar)
     # convert_to_onnx()           # ONNX (alternatif ringan)
     
+    if args.fast_model:
+        train_fast_model()
+    
     # Create test file
     create_test_inference()
     
@@ -298,3 +593,28 @@ if __name__ == "__main__":
     print("✨ Selesai! Upload file .tflite ke GitHub Pages repository")
     print("📝 Update index.html dengan kode loading model yang sesuai")
     print("="*60)
+
+def run_incremental():
+    from train_incremental import MODEL_PATH, incremental_train
+    
+    entry = incremental_train()
+    if not entry or not entry['promoted']:
+        return
+    model = tf.keras.models.load_model(MODEL_PATH)
+    model.save('oral_cancer_model.h5')
+    convert_to_tflite(model, uint8_input=True, embedding_output=True, heatmap_output=True)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.sweep:
+        run_sweep(args.sweep_alphas, args.sweep_sizes)
+    elif args.incremental:
+        run_incremental()
+    elif args.search:
+        from hparam_search import run_search
+        run_search(args.search_trials, args.search_workers)
+    elif args.export_best:
+        from hparam_search import export_best
+        export_best()
+    else:
+        main(args)